@@ -0,0 +1,268 @@
+"""
+In-process load test for the ML services: /predwaste, /predict-shelf-life,
+/predict-surplus and /search, driven through each ASGI app with weather stubbed.
+
+Payloads are generated from data/raw/test.csv and recipe/indian_food.csv. Each
+scenario runs in a fresh process so its peak RSS is its own. Results are written
+as JSON and, with --baseline, compared against a stored run:
+
+    python benchmarks/load_test.py --out results.json --baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+
+The exit status is 1 when any scenario regressed beyond --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TEST_CSV = os.path.join(ROOT, "data", "raw", "test.csv")
+RECIPES_CSV = os.path.join(ROOT, "recipe", "indian_food.csv")
+
+CITIES = ["Kolkata", "Delhi", "Mumbai", "Bengaluru", "Chennai", "Pune"]
+EVENT_TYPES = ["wedding", "corporate", "birthday", "conference", "party", "meeting", "festival"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snacks"]
+# test.csv waste_category -> shelf-life food category
+CATEGORIES = {"GRAINS": "GRAINS", "MEAT": "MEAT", "VEGETABLES": "VEGETABLES", "DAIRY": "DAIRY"}
+
+
+def waste_payloads(n, rng):
+    """/predwaste bodies from test.csv rows (mixed-case categories normalised, random city)"""
+    import pandas as pd
+    df = pd.read_csv(TEST_CSV)
+    out = []
+    for row in df.sample(n, replace=True, random_state=rng.randrange(2**31)).itertuples():
+        category = row.waste_category.upper()
+        out.append({"meals_served": float(row.meals_served), "kitchen_staff": float(row.kitchen_staff),
+                    "past_waste_kg": float(row.past_waste_kg), "special_event_1": bool(row.special_event),
+                    "waste_category_GRAINS": category == "GRAINS", "waste_category_MEAT": category == "MEAT",
+                    "waste_category_VEGETABLES": category == "VEGETABLES",
+                    "city": rng.choice(CITIES), "site": f"canteen-{rng.randrange(20)}"})
+    return out
+
+
+def shelf_life_payloads(n, rng):
+    """/predict-shelf-life bodies: storage conditions from test.csv, items per category"""
+    import pandas as pd
+    import shelf_life_predictor as slp
+    df = pd.read_csv(TEST_CSV)
+    out = []
+    for row in df.sample(n, replace=True, random_state=rng.randrange(2**31)).itertuples():
+        category = CATEGORIES.get(row.waste_category.upper(), "FRUITS")
+        items = list(slp.FOOD_SHELF_LIFE_BASE[category])
+        out.append({"foodItem": rng.choice(items + ["leftover curry"]), "foodCategory": category,
+                    "temperature": round(min(50, max(-10, row.temperature_C)), 1),
+                    "humidity": round(min(100, max(0, row.humidity_percent)), 1)})
+    return out
+
+
+def surplus_payloads(n, rng):
+    """/predict-surplus bodies: guest counts from test.csv meals_served"""
+    import pandas as pd
+    meals = pd.read_csv(TEST_CSV)["meals_served"].tolist()
+    return [{"eventName": f"event-{i}", "guestCount": int(rng.choice(meals)),
+             "eventType": rng.choice(EVENT_TYPES), "mealType": rng.choice(MEAL_TYPES),
+             "duration": rng.randint(1, 8)} for i in range(n)]
+
+
+def typo(word, rng):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+
+def search_params(n, rng):
+    """/search query strings: pantries built from recipe ingredients, some misspelt or filtered"""
+    import pandas as pd
+    df = pd.read_csv(RECIPES_CSV)
+    recipes = [[s.strip() for s in ing.split(",")] for ing in df["ingredients"]]
+    out = []
+    for _ in range(n):
+        pantry = rng.sample(rng.choice(recipes), k=1) + rng.choice(recipes)[:rng.randint(1, 4)]
+        params = {"leftovers": ",".join(pantry), "limit": rng.choice([10, 20, 50])}
+        if rng.random() < 0.2:
+            params["leftovers"] = ",".join(typo(p, rng) for p in pantry)
+            params["fuzzy"] = "true"
+        if rng.random() < 0.3:
+            params["diet"] = "vegetarian"
+        if rng.random() < 0.2:
+            params["max_time"] = rng.choice([30, 45, 60])
+        out.append(params)
+    return out
+
+
+SCENARIOS = {
+    # name: (module, method, path, payload generator)
+    "predwaste": ("modelapi", "POST", "/predwaste", waste_payloads),
+    "shelf-life": ("shelf_life_predictor", "POST", "/predict-shelf-life", shelf_life_payloads),
+    "surplus": ("shelf_life_predictor", "POST", "/predict-surplus", surplus_payloads),
+    "search": ("recipeapi", "GET", "/search", search_params),
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def drive(app, method, path, payloads, concurrency):
+    """Closed loop: `concurrency` clients each send their next request when the last returns"""
+    import httpx
+    latencies, errors = [], 0
+    queue = iter(payloads)
+
+    async def client_loop(client):
+        nonlocal errors
+        for payload in queue:
+            start = time.perf_counter()
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def run_scenario(name, requests, concurrency, warmup, seed):
+    """Runs in its own process; returns the scenario's summary"""
+    for service_dir in ("ml_ms", "recipe", "common"):
+        sys.path.insert(0, os.path.join(ROOT, service_dir))
+    os.environ.setdefault("WEATHER_BACKEND", "stub")
+    os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+    # Never touch the services' real rolling-history and impact files
+    scratch = tempfile.mkdtemp()
+    os.environ["FEATURE_STORE_PATH"] = os.path.join(scratch, "feature_store.json")
+    os.environ["IMPACT_LOG_PATH"] = os.path.join(scratch, "impact_events.jsonl")
+    os.environ["IMPACT_SNAPSHOT_PATH"] = os.path.join(scratch, "impact_snapshot.json")
+
+    module, method, path, generate = SCENARIOS[name]
+    import importlib
+    import warnings
+    warnings.filterwarnings("ignore")
+    service = importlib.import_module(module)
+    app = service.app
+    rng = random.Random(seed)
+    payloads = generate(warmup + requests, rng)
+
+    async def main():
+        async with app.router.lifespan_context(app):
+            # The model and recipe index load in the background; measure the warm service
+            while not service.warmup.ready:
+                await asyncio.sleep(0.01)
+            await drive(app, method, path, payloads[:warmup], concurrency)
+            return await drive(app, method, path, payloads[warmup:], concurrency)
+
+    latencies, errors, elapsed = asyncio.run(main())
+    latencies = sorted(x * 1000 for x in latencies)
+    return {
+        "method": method, "path": path, "requests": len(latencies), "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {"p50": round(percentile(latencies, 0.50), 3),
+                       "p95": round(percentile(latencies, 0.95), 3),
+                       "p99": round(percentile(latencies, 0.99), 3),
+                       "mean": round(sum(latencies) / len(latencies), 3),
+                       "max": round(latencies[-1], 3)},
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions: p95/p99 latency or peak RSS up, or throughput down, by more than tolerance"""
+    regressions = []
+    for key in ("requests", "concurrency", "cpu_count"):
+        if baseline.get("meta", {}).get(key) != results["meta"][key]:
+            print(f"  note: {key} differs from the baseline "
+                  f"({baseline.get('meta', {}).get(key)} vs {results['meta'][key]}), numbers may not be comparable")
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        checks = [("p95 ms", now["latency_ms"]["p95"], before["latency_ms"]["p95"], True),
+                  ("p99 ms", now["latency_ms"]["p99"], before["latency_ms"]["p99"], True),
+                  ("peak RSS MB", now["peak_rss_mb"], before["peak_rss_mb"], True),
+                  ("throughput rps", now["throughput_rps"], before["throughput_rps"], False)]
+        for label, value, reference, lower_is_better in checks:
+            change = (value - reference) / reference if reference else 0.0
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            print(f"  {name:<11} {label:<15} {reference:>10.2f} -> {value:>10.2f} ({change:+.1%})"
+                  f"{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{name} {label}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput/RSS benchmark for the ML services")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="concurrent in-process clients")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests sent first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    args = parser.parse_args()
+
+    results = {"meta": {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "requests": args.requests,
+                        "concurrency": args.concurrency, "seed": args.seed},
+               "scenarios": {}}
+
+    ctx = multiprocessing.get_context("spawn")
+    for name in args.scenarios:
+        with ctx.Pool(1) as pool:
+            summary = pool.apply(run_scenario, (name, args.requests, args.concurrency, args.warmup, args.seed))
+        results["scenarios"][name] = summary
+        lat = summary["latency_ms"]
+        print(f"{name:<11} {summary['throughput_rps']:>9.1f} req/s  p50 {lat['p50']:>8.2f}  p95 {lat['p95']:>8.2f}"
+              f"  p99 {lat['p99']:>8.2f} ms  peak RSS {summary['peak_rss_mb']:>7.1f} MB  errors {summary['errors']}")
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            sys.exit(1)
+        print("No regressions")
+
+    if any(s["errors"] for s in results["scenarios"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+for service_dir in ("ml_ms", "common"):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", service_dir))
+
+from fastapi.testclient import TestClient
+import shelf_life_predictor as slp
+
+
+def make_inventory(n, seed=42):
+    """Random inventory mixing known items, unknown items and every factor bucket"""
+    rng = random.Random(seed)
+    categories = list(slp.FOOD_SHELF_LIFE_BASE)
+    items = []
+    for _ in range(n):
+        category = rng.choice(categories)
+        name = rng.choice(list(slp.FOOD_SHELF_LIFE_BASE[category]) + ["leftover curry"])
+        items.append({"foodItem": name, "foodCategory": category,
+                      "temperature": round(rng.uniform(-5, 45), 1),
+                      "humidity": round(rng.uniform(10, 100), 1)})
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs single /predict-shelf-life, in-process")
+    parser.add_argument("-n", type=int, default=2000, help="inventory size")
+    args = parser.parse_args()
+
+    client = TestClient(slp.app)
+    items = make_inventory(args.n)
+
+    start = time.perf_counter()
+    for item in items:
+        client.post("/predict-shelf-life", json=item).raise_for_status()
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.post("/predict-shelf-life/batch", json={"items": items}).raise_for_status()
+    batch = time.perf_counter() - start
+
+    print(f"{args.n} single calls: {single * 1000:9.1f} ms ({single / args.n * 1e6:.0f} us/item)")
+    print(f"1 batch call:      {batch * 1000:9.1f} ms ({batch / args.n * 1e6:.0f} us/item)")
+    print(f"speedup:           {single / batch:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
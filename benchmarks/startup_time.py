@@ -0,0 +1,156 @@
+"""
+Cold-start check for the ML services: how long each app takes to import, to
+start serving (import + lifespan startup) and to finish its background
+warm-up, measured in fresh interpreters with weather stubbed.
+
+The gateway is measured through its real entry point, `python gateway.py`:
+serving is the time until GET /health answers, ready the time until /ready
+returns 200. A single worker listens at once and warms up in the background.
+Forked workers only start after the parent has run every warm-up, so for
+"gateway-forked" serving and ready are both the full preload.
+
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --apps waste gateway --runs 3 --out startup.json
+
+The exit status is 1 when an app's median serving time exceeds its target in
+STARTUP_TARGETS, or when a warm-up step fails. Warm-up (model unpickling, the
+recipe index) runs after a service is serving, so its time is reported but
+not part of the target, except for the forked gateway.
+"""
+import argparse
+import json
+import os
+import statistics
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+APPS = {
+    # name: module whose `app` is started
+    "waste": "modelapi",
+    "shelf-life": "shelf_life_predictor",
+    "recipes": "recipeapi",
+}
+# name: --workers for `python gateway.py`
+GATEWAYS = {"gateway": 1, "gateway-forked": 2}
+# Seconds until the app serves requests (median); fastapi + numpy alone take ~0.5s.
+# The forked gateway listens only after preloading every warm-up (inflect and the
+# model unpickling are most of it).
+STARTUP_TARGETS = {"waste": 1.0, "shelf-life": 1.0, "recipes": 1.0, "gateway": 1.5, "gateway-forked": 8.0}
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import {module} as service
+imported = time.perf_counter()
+
+async def main():
+    async with service.app.router.lifespan_context(service.app):
+        serving = time.perf_counter()
+        warmups = getattr(service, "WARMUPS", None) or [service.warmup]
+        while not all(w.ready for w in warmups) and time.perf_counter() - serving < {timeout}:
+            await asyncio.sleep(0.005)
+        return serving, time.perf_counter(), {{w.service: w.snapshot() for w in warmups}}
+
+serving, ready, warmup = asyncio.run(main())
+print(json.dumps({{"import": imported - start, "serving": serving - start, "ready": ready - start,
+                  "warmup": warmup}}))
+"""
+
+
+def service_env():
+    scratch = tempfile.mkdtemp()
+    return {**os.environ, "WEATHER_BACKEND": "stub", "MODEL_WATCH_INTERVAL": "0",
+            "PYTHONPATH": os.pathsep.join([os.path.join(ROOT, d) for d in ("ml_ms", "recipe", "common")] + [ROOT]),
+            # Never touch the services' real rolling-history and impact files
+            "FEATURE_STORE_PATH": os.path.join(scratch, "feature_store.json"),
+            "IMPACT_LOG_PATH": os.path.join(scratch, "impact_events.jsonl"),
+            "IMPACT_SNAPSHOT_PATH": os.path.join(scratch, "impact_snapshot.json")}
+
+
+def measure(module, timeout):
+    """One cold start in a fresh interpreter"""
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD.format(module=module, timeout=timeout)],
+                         cwd=ROOT, env=service_env(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url, proc, start, timeout):
+    """Poll `url` until it returns 200; (seconds since start, JSON body)"""
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gateway exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return time.perf_counter() - start, json.load(response)
+        except OSError:   # refused while starting, 503 from /ready while warming up
+            time.sleep(0.01)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def measure_gateway(workers, timeout):
+    """One cold `python gateway.py --workers N`, timed from process launch"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", "gateway.py", "--host", "127.0.0.1",
+                             "--port", str(port), "--workers", str(workers)],
+                            cwd=ROOT, env=service_env(), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        serving, _ = wait_for(f"{url}/health", proc, start, timeout)
+        ready, body = wait_for(f"{url}/ready", proc, start, timeout)
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    return {"import": None, "serving": serving, "ready": ready, "warmup": body["services"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, serving and warm-up times of the ML services")
+    parser.add_argument("--apps", nargs="+", choices=[*APPS, *GATEWAYS], default=[*APPS, *GATEWAYS])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per app (the median is reported)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for warm-up")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args()
+
+    results, over = {}, []
+    for name in args.apps:
+        if name in GATEWAYS:
+            runs = [measure_gateway(GATEWAYS[name], args.timeout) for _ in range(args.runs)]
+        else:
+            runs = [measure(APPS[name], args.timeout) for _ in range(args.runs)]
+        summary = {key: None if runs[0][key] is None else round(statistics.median(run[key] for run in runs), 3)
+                   for key in ("import", "serving", "ready")}
+        summary["target"] = STARTUP_TARGETS[name]
+        summary["warmup"] = runs[-1]["warmup"]
+        results[name] = summary
+        failed = [s for w in summary["warmup"].values() for s, step in w["steps"].items()
+                  if step["status"] != "ready"]
+        slow = summary["serving"] > summary["target"]
+        imported = "      -" if summary["import"] is None else f"{summary['import']:>6.3f}s"
+        print(f"{name:<14} import {imported}  serving {summary['serving']:>6.3f}s"
+              f"  ready {summary['ready']:>6.3f}s  (target {summary['target']:.1f}s)"
+              f"{'  OVER TARGET' if slow else ''}{'  warm-up failed: ' + ', '.join(failed) if failed else ''}")
+        if slow or failed:
+            over.append(name)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    if over:
+        print("Over target or not ready: " + ", ".join(over))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+Code shared by the Python services (ml_ms/ and recipe/): request/stage
+metrics with /metrics, and background warm-up with /health and /ready.
+"""
@@ -0,0 +1,295 @@
+"""
+Lightweight instrumentation shared by the FastAPI services: per-stage timing
+histograms, request counters and cache hit ratios, rendered in the Prometheus
+text format on /metrics, plus an opt-in per-request sampling profiler.
+
+METRICS_ENABLED=0 turns timing off entirely: stage timers become a shared
+no-op context manager and the request middleware is not installed.
+PROFILING_ENABLED=1 lets a request carrying `X-Profile: 1` be sampled; the
+response's X-Profile-Id names the profile served at /profiles/{id}.
+"""
+import bisect
+import contextlib
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+PROFILING = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 1)) / 1000
+PROFILES_KEPT = 20
+
+# Seconds, from 50us (a cached lookup) to 2.5s (a slow upstream call)
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Fixed-bucket histogram: counts per upper bound (le), plus sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self):
+        """[(le, observations <= le)], ending with +Inf, plus sum and count"""
+        with self._lock:
+            totals = list(itertools.accumulate(self.counts))
+            return list(zip(self.buckets + [float("inf")], totals)), self.sum, self.count
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {str(b): c for b, c in zip(self.buckets, self.counts)}
+            buckets["+Inf"] = self.counts[-1]
+            return {"count": self.count, "sum": self.sum,
+                    "mean": self.sum / self.count if self.count else 0.0, "buckets": buckets}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Process-wide histograms, counters and on-demand collectors"""
+
+    def __init__(self):
+        self._histograms = {}   # name -> (help, {labels: Histogram})
+        self._counters = {}     # name -> (help, {labels: value})
+        self._collectors = []   # fn() -> [(name, type, help, labels dict, value)]
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, buckets=STAGE_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, (help, {}))[1]
+            if key not in series:
+                series[key] = Histogram(buckets)
+            return series[key]
+
+    def add_histogram(self, name, help, histogram, **labels):
+        """Expose a Histogram owned elsewhere (e.g. the micro-batcher's)"""
+        with self._lock:
+            self._histograms.setdefault(name, (help, {}))[1][tuple(sorted(labels.items()))] = histogram
+
+    def inc(self, name, help, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, (help, {}))[1]
+            series[key] = series.get(key, 0) + amount
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def add_cache(self, cache, fn):
+        """fn() -> (hits, misses); exported as counters plus a hit ratio"""
+        def collect():
+            hits, misses = fn()
+            total = hits + misses
+            return [("smartserve_cache_hits_total", "counter", "Cache hits", {"cache": cache}, hits),
+                    ("smartserve_cache_misses_total", "counter", "Cache misses", {"cache": cache}, misses),
+                    ("smartserve_cache_hit_ratio", "gauge", "Cache hits / lookups", {"cache": cache},
+                     hits / total if total else 0.0)]
+        self.add_collector(collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: (help, dict(series)) for name, (help, series) in self._counters.items()}
+            histograms = {name: (help, dict(series)) for name, (help, series) in self._histograms.items()}
+        for name, (help, series) in sorted(counters.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_labels(k)} {_number(v)}" for k, v in sorted(series.items())]
+        for name, (help, series) in sorted(histograms.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for key, hist in sorted(series.items()):
+                buckets, total, count = hist.cumulative()
+                for le, n in buckets:
+                    lines.append(f"{name}_bucket{_labels(key + (('le', _number(le)),))} {n}")
+                lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        # Samples of one metric must be contiguous, whichever collector produced them
+        families = {}
+        for collect in self._collectors:
+            for name, kind, help, labels, value in collect():
+                families.setdefault(name, (kind, help, []))[2].append((labels, value))
+        for name, (kind, help, samples) in families.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+_NOOP = contextlib.nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+
+
+class Stages:
+    """`with stages("predict"):` records the block's duration under smartserve_stage_seconds"""
+
+    def __init__(self, service):
+        self.service = service
+        self._hists = {}
+
+    def __call__(self, stage):
+        if not ENABLED:
+            return _NOOP
+        hist = self._hists.get(stage)
+        if hist is None:
+            hist = self._hists[stage] = registry.histogram(
+                "smartserve_stage_seconds", "Time spent per hot-path stage",
+                service=self.service, stage=stage)
+        return _StageTimer(hist)
+
+
+# Leaf frames in these files are threads waiting, not working
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+
+class SamplingProfiler:
+    """Samples the stacks of one request's threads every `interval` seconds"""
+
+    def __init__(self, threads, interval=PROFILE_INTERVAL):
+        self.threads = threads          # thread idents or name prefixes to sample
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _wanted(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        return {ident for ident, name in names.items()
+                if ident in self.threads or any(name.startswith(p) for p in self.threads if isinstance(p, str))}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            wanted = self._wanted()
+            for ident, frame in sys._current_frames().items():
+                if ident not in wanted or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 64:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self, top=50):
+        self._stop.set()
+        self._thread.join()
+        return {"duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "interval_ms": self.interval * 1000, "samples": self.samples,
+                "stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(top)]}
+
+
+profiles = OrderedDict()
+_profile_ids = itertools.count(1)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template"""
+
+    def __init__(self, app, service):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        profiler = profile_id = None
+        if PROFILING and (b"x-profile", b"1") in scope.get("headers", ()):
+            profile_id = str(next(_profile_ids))
+            # The event loop thread plus the CPU pool and sync-endpoint threads
+            profiler = SamplingProfiler({threading.get_ident(), "cpu", "AnyIO"}).start()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id is not None:
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            registry.inc("smartserve_requests_total", "HTTP requests",
+                         service=self.service, method=scope["method"], path=path, status=status)
+            registry.histogram("smartserve_request_seconds", "HTTP request latency",
+                               service=self.service, method=scope["method"], path=path).observe(elapsed)
+            if profiler is not None:
+                profiles[profile_id] = {"id": profile_id, "method": scope["method"], "path": path,
+                                        **profiler.stop()}
+                while len(profiles) > PROFILES_KEPT:
+                    profiles.popitem(last=False)
+
+
+# Served by instrument(); the gateway serves a single copy for all services
+METRICS_PATHS = {"/metrics", "/profiles/{profile_id}"}
+
+
+def instrument(app, service):
+    """Add request metrics, /metrics and /profiles/{id} to a FastAPI app"""
+    if ENABLED:
+        app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics():
+        return registry.render()
+
+    @app.get("/profiles/{profile_id}", include_in_schema=False)
+    async def profile(profile_id: str):
+        if profile_id not in profiles:
+            raise HTTPException(status_code=404, detail="Profile not found (profiling needs PROFILING_ENABLED=1)")
+        return profiles[profile_id]
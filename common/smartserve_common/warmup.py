@@ -0,0 +1,104 @@
+"""
+Background warm-up for the FastAPI services and the /health and /ready
+endpoints that report it.
+
+Heavy artifacts (the waste model with its xgboost/sklearn unpickling, the
+recipe index, the inflect engine) load in a worker thread once the server is
+up, so a new container answers /health within the import time of the app.
+/ready returns 503 until every step has finished; a request that needs an
+artifact still loading gets 503 with Retry-After instead of blocking.
+"""
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+
+# Seconds between attempts when a step fails (e.g. the model file is not there yet)
+RETRY_INTERVAL = 5.0
+
+
+class NotReady(RuntimeError):
+    """Raised for an artifact the warm-up has not loaded yet; served as 503"""
+
+
+class Warmup:
+    """Named load steps, run once each, in order, off the event loop"""
+
+    def __init__(self, service):
+        self.service = service
+        self.steps = {}
+        self.state = {}
+        self.ready_after = None
+        self._started = None
+        self._task = None
+
+    def add(self, name, fn):
+        self.steps[name] = fn
+        self.state[name] = {"status": "pending"}
+
+    @property
+    def ready(self):
+        return all(step["status"] == "ready" for step in self.state.values())
+
+    def run(self):
+        """Run the steps not done yet in this thread (the gateway does this before forking)"""
+        for name, fn in self.steps.items():
+            if self.state[name]["status"] == "ready":
+                continue
+            self.state[name] = {"status": "running"}
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                print(f"Warm-up of {self.service} {name} failed: {e}")
+                self.state[name] = {"status": "failed", "error": str(e)}
+                continue
+            self.state[name] = {"status": "ready", "seconds": round(time.perf_counter() - start, 3)}
+        return self.ready
+
+    async def _run(self, retry):
+        while not await asyncio.to_thread(self.run):
+            await asyncio.sleep(retry)
+        self.ready_after = round(time.perf_counter() - self._started, 3)
+        print(f"{self.service} ready after {self.ready_after}s")
+
+    def start(self, retry=RETRY_INTERVAL):
+        self._started = time.perf_counter()
+        if self.ready:
+            self.ready_after = 0.0
+            return
+        self._task = asyncio.create_task(self._run(retry))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self):
+        return {"ready": self.ready, "ready_after": self.ready_after, "steps": self.state}
+
+
+# Served by add_health(); the gateway serves one pair covering every service
+HEALTH_PATHS = {"/health", "/ready"}
+
+
+def add_health(app, *warmups):
+    """/health (process is up), /ready (warm-up done) and 503s for NotReady on a FastAPI app"""
+
+    def status():
+        return {"ready": all(w.ready for w in warmups),
+                "services": {w.service: w.snapshot() for w in warmups}}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", **status()}
+
+    @app.get("/ready")
+    async def ready():
+        body = status()
+        return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+    async def not_ready(request, exc):
+        return JSONResponse({"detail": f"Warming up: {exc}"}, status_code=503, headers={"Retry-After": "1"})
+
+    app.add_exception_handler(NotReady, not_ready)
@@ -0,0 +1,220 @@
+"""
+One entry point for the ML services: the waste predictor (ml_ms/modelapi.py),
+shelf life (ml_ms/shelf_life_predictor.py) and recipe search (recipe/recipeapi.py)
+served on a single port with their original paths.
+
+A single worker listens at once and warms up in the background, like the
+services do: /health answers within about a second, /ready turns 200 once the
+artifacts are loaded (about 6 s). With several workers, artifacts are loaded
+once in the parent process and workers are forked from it, so the model,
+scaler and recipe index pages are shared copy-on-write; the port only opens
+after that preload.
+
+Routes backed by in-process state (the waste feature store, the inventory and
+the impact ledger) are served by worker 0 alone; the other workers forward
+them to it over a unix socket, so every client sees the same state.
+
+    python gateway.py --port 8000 --workers 4
+"""
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+from contextlib import AsyncExitStack, asynccontextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The services' flat modules, plus the shared package when it isn't pip-installed
+for service_dir in ("ml_ms", "recipe", "common"):
+    path = os.path.join(BASE_DIR, service_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from starlette.routing import Route
+from smartserve_common.metrics import METRICS_PATHS, instrument
+from smartserve_common.warmup import HEALTH_PATHS, add_health
+
+import modelapi
+import recipeapi
+import shelf_life_predictor
+
+SERVICES = {
+    "waste": modelapi.app,
+    "shelf-life": shelf_life_predictor.app,
+    "recipes": recipeapi.app,
+}
+WARMUPS = [modelapi.warmup, shelf_life_predictor.warmup, recipeapi.warmup]
+# Routes that read or write in-process state: every waste route uses the per-site
+# feature store; these shelf-life paths use the inventory index or the impact ledger
+STATEFUL_SERVICES = {"waste"}
+STATEFUL_PATHS = ("/inventory", "/expiring", "/track-impact", "/impact/", "/leaderboard")
+# Not copied when forwarding a request to worker 0 or its response back
+HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding"}
+state_client = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Run every service's own startup/shutdown (model watcher, feature store, ...)
+    async with AsyncExitStack() as stack:
+        for service in SERVICES.values():
+            await stack.enter_async_context(service.router.lifespan_context(service))
+        yield
+        if state_client is not None:
+            await state_client.aclose()
+
+
+app = FastAPI(title="Smart Serve ML Gateway", lifespan=lifespan)
+# One /metrics for the whole process: every service records into the same registry
+instrument(app, "gateway")
+# /ready turns 200 once every service has warmed up
+add_health(app, *WARMUPS)
+
+
+@app.get('/')
+async def root():
+    return {"services": {name: sorted({r.path for r in service.routes if isinstance(r, APIRoute)
+                                       and r.path != "/" and r.path not in METRICS_PATHS | HEALTH_PATHS})
+                         for name, service in SERVICES.items()}}
+
+
+def stateful(name, route):
+    return name in STATEFUL_SERVICES or route.path.startswith(STATEFUL_PATHS)
+
+
+def mount_services():
+    """Copy each service's API routes onto the gateway, refusing clashing paths"""
+    seen = {}
+    for name, service in SERVICES.items():
+        for route in service.routes:
+            if (not isinstance(route, APIRoute) or route.path == "/"
+                    or route.path in METRICS_PATHS | HEALTH_PATHS):
+                continue
+            for method in route.methods:
+                clash = seen.setdefault((method, route.path), name)
+                if clash != name:
+                    raise RuntimeError(f"{method} {route.path} is served by both {clash} and {name}")
+            app.router.routes.append(route)
+            if stateful(name, route):
+                STATE_ROUTES.append(route)
+
+
+STATE_ROUTES = []
+
+
+mount_services()
+
+
+def preload():
+    """Run every warm-up step here, so workers start ready and share the loaded artifacts"""
+    for warmup in WARMUPS:
+        warmup.run()
+    # Keep the preloaded objects out of GC passes so workers don't dirty their shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def persisted_stores():
+    """[(object, path attribute)] for every file the stateful routes snapshot to"""
+    ledger = shelf_life_predictor.impact_ledger
+    return [(modelapi.feature_store, "path"), (ledger, "log_path"), (ledger, "snapshot_path")]
+
+
+def forward_state_routes(socket_path):
+    """
+    In workers other than 0: swap the stateful routes for ones that forward the
+    request to worker 0 over `socket_path`, and never write the state files.
+    """
+    import httpx
+
+    for store, attr in persisted_stores():
+        setattr(store, attr, None)
+
+    async def forward(request: Request):
+        global state_client
+        if state_client is None:
+            state_client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=socket_path),
+                                             base_url="http://gateway-state", timeout=60)
+        path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        headers = [(k, v) for k, v in request.headers.items() if k not in HOP_HEADERS]
+        try:
+            upstream = await state_client.request(request.method, path, headers=headers,
+                                                  content=await request.body())
+        except httpx.HTTPError as e:
+            return JSONResponse({"detail": f"State worker unavailable: {e!r}"}, status_code=503,
+                                headers={"Retry-After": "1"})
+        return Response(upstream.content, status_code=upstream.status_code,
+                        headers={k: v for k, v in upstream.headers.items() if k not in HOP_HEADERS})
+
+    routes = app.router.routes
+    for i, route in enumerate(routes):
+        if route in STATE_ROUTES:
+            routes[i] = Route(route.path, forward, methods=route.methods, name=route.name)
+
+
+def serve(host, port, workers):
+    config = uvicorn.Config(app, host=host, port=port)
+    if workers > 1 and not hasattr(os, "fork"):
+        print("Forking workers is not supported on this platform; running a single worker")
+        workers = 1
+    if workers <= 1:
+        # Nothing to share: listen now and let the services' lifespans warm up in the background
+        uvicorn.Server(config).run()
+        return
+
+    preload()
+    print(f"Starting {workers} workers on {host}:{port}. Worker 0 holds the feature store, "
+          f"inventory and impact ledger; the other workers forward those routes to it.")
+    sock = config.bind_socket()
+    state_dir = tempfile.mkdtemp(prefix="smartserve-gateway-")
+    socket_path = os.path.join(state_dir, "state.sock")
+    state_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    state_sock.bind(socket_path)
+    state_sock.listen(2048)
+    children = []
+    for worker in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if worker == 0:
+                sockets = [sock, state_sock]
+            else:
+                state_sock.close()
+                forward_state_routes(socket_path)
+                sockets = [sock]
+            uvicorn.Server(config).run(sockets=sockets)
+            os._exit(0)
+        children.append(pid)
+    # Only worker 0 may hold the state socket, so the others fail fast if it dies
+    state_sock.close()
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for child in children:
+        os.waitpid(child, 0)
+    sock.close()
+    shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve all ML APIs from one process group")
+    parser.add_argument("--host", default=os.environ.get("GATEWAY_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("GATEWAY_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("GATEWAY_WORKERS", 1)))
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
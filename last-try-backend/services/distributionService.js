@@ -7,26 +7,32 @@ const axios = require("axios");
 // ML Microservice configuration
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || "http://localhost:8000";
 
+/**
+ * Prepare the /predwaste payload for an event
+ */
+async function buildPredictionData(event) {
+  const predictionData = {
+    meals_served: event.meals_served || 100, // Default if not set
+    kitchen_staff: event.kitchen_staff || 5, // Default if not set
+    past_waste_kg: 0, // Will be calculated from historical data
+    special_event_1: false, // Can be enhanced based on event type
+    waste_category_GRAINS: event.food_category === 'grains',
+    waste_category_MEAT: event.food_category === 'meat',
+    waste_category_VEGETABLES: event.food_category === 'vegetables',
+    city: event.city || "Mumbai" // Default city
+  };
+
+  // Get historical waste data for past_waste_kg calculation
+  predictionData.past_waste_kg = await calculatePastWaste(event.city);
+  return predictionData;
+}
+
 /**
  * Fetch predicted food waste from ML microservice
  */
 async function getPredictedWaste(event) {
   try {
-    // Prepare data for ML prediction
-    const predictionData = {
-      meals_served: event.meals_served || 100, // Default if not set
-      kitchen_staff: event.kitchen_staff || 5, // Default if not set
-      past_waste_kg: 0, // Will be calculated from historical data
-      special_event_1: false, // Can be enhanced based on event type
-      waste_category_GRAINS: event.food_category === 'grains',
-      waste_category_MEAT: event.food_category === 'meat',
-      waste_category_VEGETABLES: event.food_category === 'vegetables',
-      city: event.city || "Mumbai" // Default city
-    };
-
-    // Get historical waste data for past_waste_kg calculation
-    const pastWaste = await calculatePastWaste(event.city);
-    predictionData.past_waste_kg = pastWaste;
+    const predictionData = await buildPredictionData(event);
 
     console.log("🤖 Calling ML service with data:", predictionData);
 
@@ -57,6 +63,35 @@ async function getPredictedWaste(event) {
   }
 }
 
+/**
+ * Fetch predicted food waste for many events with a single ML call.
+ * Results are returned in the same order as `events`.
+ */
+async function getPredictedWasteBatch(events) {
+  try {
+    const payload = await Promise.all(events.map(buildPredictionData));
+
+    const response = await axios.post(`${ML_SERVICE_URL}/predwaste/batch`, payload, {
+      timeout: 10000,
+      headers: {
+        'Content-Type': 'application/json'
+      }
+    });
+
+    return response.data.results.map(result => result.error
+      ? { success: false, predictedWaste: null, error: JSON.stringify(result.error) }
+      : { success: true, predictedWaste: result.pred, confidence: "high" });
+
+  } catch (error) {
+    console.error("❌ ML Service Error:", error.message);
+    return events.map(() => ({
+      success: false,
+      predictedWaste: null,
+      error: error.message
+    }));
+  }
+}
+
 /**
  * Calculate past waste based on historical data
  */
@@ -245,21 +280,16 @@ async function getUpcomingEventPredictions() {
       date: { $gte: new Date() }
     }).sort({ date: 1 }).limit(10);
 
-    const predictions = [];
-    
-    for (const event of upcomingEvents) {
-      const mlResult = await getPredictedWaste(event);
-      predictions.push({
-        eventId: event._id,
-        eventName: event.title,
-        eventDate: event.date,
-        predictedWaste: mlResult.success ? mlResult.predictedWaste : null,
-        confidence: mlResult.success ? mlResult.confidence : null,
-        success: mlResult.success
-      });
-    }
+    const mlResults = await getPredictedWasteBatch(upcomingEvents);
 
-    return predictions;
+    return upcomingEvents.map((event, i) => ({
+      eventId: event._id,
+      eventName: event.title,
+      eventDate: event.date,
+      predictedWaste: mlResults[i].success ? mlResults[i].predictedWaste : null,
+      confidence: mlResults[i].success ? mlResults[i].confidence : null,
+      success: mlResults[i].success
+    }));
   } catch (error) {
     console.error("Error getting upcoming event predictions:", error);
     return [];
@@ -269,6 +299,7 @@ async function getUpcomingEventPredictions() {
 module.exports = { 
   distributeFoodLogic, 
   getPredictedWaste, 
+  getPredictedWasteBatch,
   getUpcomingEventPredictions 
 };
 
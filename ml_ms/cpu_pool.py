@@ -0,0 +1,32 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads for CPU-bound work (scaling, XGBoost, NumPy all release the GIL)
+CPU_POOL_THREADS = int(os.environ.get("CPU_POOL_THREADS", min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_pid = None
+
+
+def pool():
+    """This process's executor, created on first use so forked workers each get their own"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(max_workers=CPU_POOL_THREADS, thread_name_prefix="cpu")
+        _pool_pid = os.getpid()
+    return _pool
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run fn in the bounded pool so the event loop keeps serving while it computes"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
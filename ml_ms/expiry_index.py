@@ -0,0 +1,126 @@
+import bisect
+import time
+
+
+class TrackedItem:
+    __slots__ = ("item_id", "food_item", "category", "temperature", "humidity",
+                 "consumed", "updated_at", "expires_at")
+
+    def __init__(self, item_id, food_item, category, temperature, humidity, now):
+        self.item_id = item_id
+        self.food_item = food_item
+        self.category = category
+        self.temperature = temperature
+        self.humidity = humidity
+        self.consumed = 0.0        # fraction of shelf life used up to `updated_at`
+        self.updated_at = now
+        self.expires_at = now
+
+
+class ExpiryIndex:
+    """
+    Registered inventory ordered by expiry in a time wheel: items sit in
+    `bucket_seconds`-wide buckets keyed by expiry time, with the bucket keys kept
+    sorted, so "expiring within H hours" only touches the buckets between the
+    retention cutoff and now + H. Items expired for more than
+    `retain_expired_hours` are purged as the clock passes them.
+
+    When a reading changes, the shelf life already used up is kept as a fraction
+    and the rest is recomputed under the new conditions, so an item that spent
+    half its life warm keeps only half its life after moving to the fridge.
+    `life_hours(food_item, category, temperature, humidity)` gives the full
+    shelf life in hours under fixed conditions.
+    """
+
+    def __init__(self, life_hours, bucket_seconds=3600, clock=time.time, retain_expired_hours=24):
+        self.life_hours = life_hours
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.retain_expired_hours = retain_expired_hours
+        self.items = {}
+        self.buckets = {}
+        self.keys = []          # bucket keys, ascending
+        self.purged = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def _bucket(self, ts):
+        return int(ts // self.bucket_seconds)
+
+    def _place(self, item):
+        key = self._bucket(item.expires_at)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = set()
+            bisect.insort(self.keys, key)
+        bucket.add(item.item_id)
+
+    def _unplace(self, item):
+        key = self._bucket(item.expires_at)
+        bucket = self.buckets[key]
+        bucket.discard(item.item_id)
+        if not bucket:
+            del self.buckets[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def purge_expired(self, now=None):
+        """Drop items expired more than retain_expired_hours ago; only their buckets are visited"""
+        cutoff = (self.clock() if now is None else now) - self.retain_expired_hours * 3600
+        purged = 0
+        while self.keys and self.keys[0] <= self._bucket(cutoff):
+            key = self.keys[0]
+            for item_id in [i for i in self.buckets[key] if self.items[i].expires_at <= cutoff]:
+                self.remove(item_id)
+                purged += 1
+            if self.keys and self.keys[0] == key:
+                break   # the cutoff falls inside this bucket; the rest are still retained
+        self.purged += purged
+        return purged
+
+    def _life(self, item):
+        return self.life_hours(item.food_item, item.category, item.temperature, item.humidity)
+
+    def add(self, item_id, food_item, category, temperature, humidity):
+        """Register (or re-register) an item stored from now under the given reading"""
+        self.remove(item_id)
+        now = self.clock()
+        self.purge_expired(now)
+        item = TrackedItem(item_id, food_item, category, temperature, humidity, now)
+        item.expires_at = now + self._life(item) * 3600
+        self.items[item_id] = item
+        self._place(item)
+        return item
+
+    def remove(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is not None:
+            self._unplace(item)
+        return item is not None
+
+    def update_reading(self, item_id, temperature, humidity):
+        """Recompute one item's expiry after its storage reading changed"""
+        item = self.items[item_id]
+        now = self.clock()
+        item.consumed += (now - item.updated_at) / 3600 / self._life(item)
+        item.temperature, item.humidity, item.updated_at = temperature, humidity, now
+        if item.consumed < 1:
+            self._unplace(item)
+            item.expires_at = now + (1 - item.consumed) * self._life(item) * 3600
+            self._place(item)
+        return item
+
+    def expiring(self, within_hours):
+        """
+        Items expiring by now + within_hours, soonest first, including ones
+        expired within the last retain_expired_hours (older ones are purged)
+        """
+        now = self.clock()
+        self.purge_expired(now)
+        limit = now + within_hours * 3600
+        found = []
+        for key in self.keys[:bisect.bisect_right(self.keys, self._bucket(limit))]:
+            found.extend(item for item in map(self.items.__getitem__, self.buckets[key])
+                         if item.expires_at <= limit)
+        found.sort(key=lambda item: item.expires_at)
+        return found
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+from collections import deque
+
+# Same windows as preprocess.PAST_WINDOWS; kept here so serving doesn't import pandas
+PAST_WINDOWS = {"PastWaste_3daysAvg": 3, "PastWaste_7daysAvg": 7}
+HISTORY = max(PAST_WINDOWS.values())
+
+
+class RollingWindow:
+    """Last HISTORY waste observations of one site with running sums per window"""
+    __slots__ = ("values", "sums")
+
+    def __init__(self, values=()):
+        self.values = deque(maxlen=HISTORY)
+        self.sums = dict.fromkeys(PAST_WINDOWS, 0.0)
+        for value in values:
+            self.append(value)
+
+    def append(self, value):
+        values = self.values
+        for col, window in PAST_WINDOWS.items():
+            if len(values) >= window:
+                self.sums[col] -= values[-window]
+            self.sums[col] += value
+        values.append(value)
+
+    def averages(self):
+        """Mean per window, or None while fewer observations than the window exist"""
+        n = len(self.values)
+        return {col: self.sums[col] / window if n >= window else None
+                for col, window in PAST_WINDOWS.items()}
+
+    def averages_or(self, fallback):
+        """averages(), with `fallback` values for the windows not yet full"""
+        return {col: fallback[col] if value is None else value
+                for col, value in self.averages().items()}
+
+
+class FeatureStore:
+    """
+    Per-site rolling waste features, updated online as actual waste is logged.
+    Sites are keyed by canteen id when given, otherwise by city. The store is
+    snapshotted to a small JSON file (last HISTORY values per site) so it
+    survives restarts without replaying history.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.sites = {}
+        self._dirty = False
+
+    @staticmethod
+    def key(city, site=None):
+        return (site or city).strip().lower()
+
+    def ingest(self, key, food_waste_kg):
+        window = self.sites.get(key)
+        if window is None:
+            window = self.sites[key] = RollingWindow()
+        window.append(float(food_waste_kg))
+        self._dirty = True
+        return window.averages()
+
+    def averages(self, key, fallback):
+        """Site averages, using `fallback` (the global past.pkl values) for incomplete windows"""
+        window = self.sites.get(key)
+        if window is None:
+            return dict(fallback)
+        return window.averages_or(fallback)
+
+    def window(self, key):
+        """A detached copy of a site's window, for rolling predictions forward"""
+        window = self.sites.get(key)
+        return RollingWindow(window.values if window is not None else ())
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        self.sites = {key: RollingWindow(values) for key, values in snapshot["sites"].items()}
+        self._dirty = False
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        snapshot = {"version": 1, "sites": {key: list(w.values) for key, w in self.sites.items()}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    async def autosave(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Feature store snapshot failed: {e}")
+
+
+def store_from_env():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return FeatureStore(os.environ.get("FEATURE_STORE_PATH", os.path.join(base_dir, "feature_store.json")))
@@ -0,0 +1,262 @@
+import asyncio
+import bisect
+import heapq
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:     # Windows: no advisory locks, one writer is up to the deployment
+    fcntl = None
+
+# Conversion factors (the ratios the old per-role figures used)
+CO2_PER_KG = 0.526       # kg CO2e avoided per kg of food kept from waste
+MEALS_PER_KG = 1.6       # meals per kg when an event doesn't give a count
+SCORE_PER_KG = {"donation": 10.0, "consumption": 5.0}
+# Leaders kept ready per board; larger requests scan the users
+LEADERBOARD_SIZE = 100
+
+
+class Totals:
+    """Running impact totals for one user or role"""
+    __slots__ = ("kg", "co2", "meals", "score", "events")
+
+    def __init__(self, kg=0.0, co2=0.0, meals=0, score=0.0, events=0):
+        self.kg = kg
+        self.co2 = co2
+        self.meals = meals
+        self.score = score
+        self.events = events
+
+    def add(self, kg, co2, meals, score):
+        self.kg += kg
+        self.co2 += co2
+        self.meals += meals
+        self.score += score
+        self.events += 1
+
+    def as_list(self):
+        return [self.kg, self.co2, self.meals, self.score, self.events]
+
+    def as_dict(self):
+        return {"foodWasteReduced": round(self.kg, 2), "carbonFootprintSaved": round(self.co2, 2),
+                "mealsSaved": self.meals, "impactScore": round(self.score, 2), "events": self.events}
+
+
+class TopScores:
+    """
+    The `size` highest scores, kept sorted as (-score, member). Scores only
+    grow, so a member outside the board can only get on by its own update.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = []
+        self.keys = {}
+
+    def update(self, member, score):
+        key = (-score, member)
+        old = self.keys.get(member)
+        if old is not None:
+            del self.entries[bisect.bisect_left(self.entries, old)]
+        elif len(self.entries) >= self.size and key >= self.entries[-1]:
+            return
+        bisect.insort(self.entries, key)
+        self.keys[member] = key
+        if len(self.entries) > self.size:
+            _, dropped = self.entries.pop()
+            del self.keys[dropped]
+
+    def top(self, n):
+        return [member for _, member in self.entries[:n]]
+
+
+class ImpactLedger:
+    """
+    Append-only impact events (donations, consumption) with running totals per
+    user and per role, updated in O(1) per event. Events are appended to a JSON
+    lines log; snapshots store only the totals plus the log offset they cover,
+    so a restart replays just the events logged after the last snapshot.
+
+    A ledger is the only writer of its files: load() takes an exclusive lock on
+    the log, and a second process opening the same log fails instead of keeping
+    its own partial totals.
+    """
+
+    def __init__(self, log_path=None, snapshot_path=None):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self._reset()
+        self._log = None
+        self._dirty = False
+
+    def _reset(self):
+        self.users = {}
+        self.user_types = {}
+        self.roles = {}
+        self.role_users = {}
+        self.leaders = TopScores(LEADERBOARD_SIZE)
+        self.role_leaders = {}
+        self.offset = 0
+
+    def _apply(self, event):
+        user_id, role = event["userId"], event["userType"].strip().lower()
+        kg = event["foodKg"]
+        meals = event.get("meals")
+        if meals is None:
+            meals = round(kg * MEALS_PER_KG)
+        impact = (kg, kg * CO2_PER_KG, meals, kg * SCORE_PER_KG[event["kind"]])
+
+        totals = self.users.get(user_id)
+        if totals is None:
+            totals = self.users[user_id] = Totals()
+        totals.add(*impact)
+        self.roles.setdefault(role, Totals()).add(*impact)
+
+        previous = self.user_types.get(user_id)
+        if previous != role:
+            self.user_types[user_id] = role
+            self.role_users.setdefault(role, set()).add(user_id)
+            if previous is not None:
+                # Rare: drop the user from the old role's board and refill it from that role's users
+                self.role_users[previous].discard(user_id)
+                self.role_leaders[previous] = self._board(self.role_users[previous])
+        self.leaders.update(user_id, totals.score)
+        self.role_leaders.setdefault(role, TopScores(LEADERBOARD_SIZE)).update(user_id, totals.score)
+        return totals
+
+    def _board(self, user_ids):
+        board = TopScores(LEADERBOARD_SIZE)
+        for user_id in heapq.nsmallest(LEADERBOARD_SIZE, user_ids, key=lambda u: (-self.users[u].score, u)):
+            board.update(user_id, self.users[user_id].score)
+        return board
+
+    def record(self, events):
+        """
+        Apply events (dicts: userId, userType, kind, foodKg, optional meals and
+        timestamp), appending them to the log once load() has opened it.
+        """
+        if self._log is not None:
+            data = b"".join(json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n" for event in events)
+            self._log.write(data)
+            self._log.flush()
+            self.offset += len(data)
+        touched = {event["userId"]: self._apply(event) for event in events}
+        self._dirty = True
+        return touched
+
+    def user(self, user_id):
+        return self.users.get(user_id) or Totals()
+
+    def leaderboard(self, limit=10, user_type=None):
+        """[(userId, userType, Totals)] by score, highest first (ties by userId)"""
+        if user_type is None:
+            board, members = self.leaders, self.users
+        else:
+            user_type = user_type.strip().lower()
+            board, members = self.role_leaders.get(user_type), self.role_users.get(user_type, ())
+        if board is None:
+            return []
+        if limit <= board.size:
+            ids = board.top(limit)
+        else:
+            ids = heapq.nsmallest(limit, members, key=lambda u: (-self.users[u].score, u))
+        return [(u, self.user_types[u], self.users[u]) for u in ids]
+
+    def load(self):
+        """Totals from the last snapshot, then replay of the log written after it"""
+        self.close()
+        self._reset()
+        if self.log_path:
+            self._lock_log()
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            for user_id, (role, *totals) in snapshot["users"].items():
+                self.users[user_id] = Totals(*totals)
+                self.user_types[user_id] = role
+                self.role_users.setdefault(role, set()).add(user_id)
+            self.roles = {role: Totals(*totals) for role, totals in snapshot["roles"].items()}
+            self.leaders = self._board(self.users)
+            self.role_leaders = {role: self._board(ids) for role, ids in self.role_users.items()}
+            self.offset = snapshot["log_offset"]
+
+        replayed = skipped = 0
+        if self.log_path and os.path.exists(self.log_path):
+            with open(self.log_path, "rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                if self.offset > size:
+                    print("Impact log is shorter than the snapshot expects; keeping the snapshot totals")
+                    self.offset = size
+                if self.offset > 0:
+                    f.seek(self.offset - 1)
+                    if f.read(1) != b"\n":
+                        # The snapshot offset is mid-line (the log had another writer): resync at the next line
+                        fragment = f.readline()
+                        self.offset += len(fragment)
+                        skipped += 1
+                        if not fragment.endswith(b"\n"):
+                            f.seek(0, os.SEEK_END)
+                            f.write(b"\n")
+                            self.offset += 1
+                f.seek(self.offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn final write: drop it so later appends start on a fresh line
+                        f.truncate(self.offset)
+                        break
+                    try:
+                        self._apply(json.loads(line))
+                        replayed += 1
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        skipped += 1
+                    self.offset += len(line)
+        if skipped:
+            print(f"Impact log: skipped {skipped} unreadable line(s)")
+        # A resync is saved too, so the next start does not repeat it
+        self._dirty = replayed > 0 or skipped > 0
+        return replayed
+
+    def _lock_log(self):
+        self._log = open(self.log_path, "ab")
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.close()
+            raise RuntimeError(f"{self.log_path} is already written by another process; "
+                               f"run one impact ledger per log") from None
+
+    def save(self):
+        if not self.snapshot_path or not self._dirty:
+            return
+        snapshot = {"version": 1, "log_offset": self.offset,
+                    "users": {u: [self.user_types[u], *t.as_list()] for u, t in self.users.items()},
+                    "roles": {role: t.as_list() for role, t in self.roles.items()}}
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+        self._dirty = False
+
+    async def autosave(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Impact snapshot failed: {e}")
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def ledger_from_env():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return ImpactLedger(
+        log_path=os.environ.get("IMPACT_LOG_PATH", os.path.join(base_dir, "impact_events.jsonl")),
+        snapshot_path=os.environ.get("IMPACT_SNAPSHOT_PATH", os.path.join(base_dir, "impact_snapshot.json")),
+    )
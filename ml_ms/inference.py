@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+
+class SklearnPredictor:
+    """Reference backend: the pickled XGBRegressor's own predict()"""
+    name = "sklearn"
+    source = "pickle"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, x):
+        return self.model.predict(x)
+
+
+class BoosterPredictor:
+    """Native backend: Booster.inplace_predict, skipping the sklearn wrapper and DMatrix"""
+    name = "booster"
+
+    def __init__(self, booster, source):
+        self.booster = booster
+        self.source = source
+        best = booster.attr("best_iteration")
+        self.iteration_range = (0, int(best) + 1) if best is not None else (0, 0)
+
+    def predict(self, x):
+        return self.booster.inplace_predict(x, iteration_range=self.iteration_range)
+
+
+def booster_path_for(model_path):
+    """Native booster file written next to the pickled model by train_model"""
+    return os.path.splitext(model_path)[0] + ".ubj"
+
+
+def export_booster(model, model_path):
+    path = booster_path_for(model_path)
+    model.get_booster().save_model(path)
+    return path
+
+
+def available_predictors(model, booster_path=None):
+    """Every backend that can be built for this model, fastest-first by expectation"""
+    predictors = []
+    if booster_path and os.path.exists(booster_path):
+        import xgboost
+        try:
+            booster = xgboost.Booster()
+            booster.load_model(booster_path)
+            predictors.append(BoosterPredictor(booster, os.path.basename(booster_path)))
+        except xgboost.core.XGBoostError as e:
+            print(f"Ignoring unreadable booster file {booster_path}: {e}")
+    if hasattr(model, "get_booster"):
+        predictors.append(BoosterPredictor(model.get_booster(), "pickle"))
+    predictors.append(SklearnPredictor(model))
+    return predictors
+
+
+def _time_single_row(predictor, probe, repeats=20):
+    row = probe[:1]
+    predictor.predict(row)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predictor.predict(row)
+    return (time.perf_counter() - start) / repeats
+
+
+def select_predictor(model, n_features, booster_path=None, preference="auto", tol=1e-4):
+    """
+    Pick the fastest backend whose output matches the sklearn model on a random
+    probe. `preference` ("sklearn"/"booster") forces a backend when available.
+    """
+    predictors = available_predictors(model, booster_path)
+    reference = predictors[-1]
+    if preference != "auto":
+        return next((p for p in predictors if p.name == preference), reference)
+
+    probe = np.random.default_rng(0).normal(size=(64, n_features))
+    expected = reference.predict(probe)
+    best, best_time = reference, _time_single_row(reference, probe)
+    for predictor in predictors[:-1]:
+        try:
+            if not np.allclose(predictor.predict(probe), expected, atol=tol):
+                print(f"Skipping {predictor.name} backend ({predictor.source}): predictions differ")
+                continue
+        except Exception as e:
+            print(f"Skipping {predictor.name} backend ({predictor.source}): {e}")
+            continue
+        elapsed = _time_single_row(predictor, probe)
+        if elapsed < best_time:
+            best, best_time = predictor, elapsed
+    return best
+
+
+def check_parity(bundle, csv_path, booster_path=None):
+    """Max absolute difference of every backend against the pickled model on a raw CSV"""
+    import pandas as pd
+    from preprocess import RAW_DTYPES, engineer_features
+
+    df = engineer_features(pd.read_csv(csv_path, dtype=RAW_DTYPES))
+    for col, value in bundle.past.items():
+        if col not in df.columns:
+            df[col] = value
+    x = df.reindex(columns=bundle.order, fill_value=0).to_numpy(dtype=float)
+    x[:, bundle.numeric_idx] = bundle.scaler.transform(x[:, bundle.numeric_idx])
+
+    expected = bundle.model.predict(x)
+    return {f"{p.name}:{p.source}": float(np.max(np.abs(p.predict(x) - expected)))
+            for p in available_predictors(bundle.model, booster_path)}
+
+
+if __name__ == "__main__":
+    # Usage: python inference.py [raw_csv] [--export]
+    # Checks every backend against the pickled model without touching the artifacts: a
+    # missing .ubj is exported to a temp dir for the check, or next to the model with --export
+    import argparse
+    import tempfile
+    from registry import registry_from_env, BASE_DIR
+
+    parser = argparse.ArgumentParser(description="Check inference backends against the pickled model")
+    parser.add_argument("csv_path", nargs="?", default=os.path.join(BASE_DIR, "..", "data", "raw", "test.csv"))
+    parser.add_argument("--export", action="store_true", help="write the native booster next to the model")
+    args = parser.parse_args()
+
+    registry = registry_from_env()
+    bundle = registry.load()
+    model_path = registry.paths[0]
+    booster_path = booster_path_for(model_path)
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.export:
+            print(f"Exported native booster to: {export_booster(bundle.model, model_path)}")
+        elif not os.path.exists(booster_path):
+            booster_path = export_booster(bundle.model, os.path.join(scratch, os.path.basename(model_path)))
+
+        tol = 1e-4
+        report = check_parity(bundle, args.csv_path, booster_path)
+    for name, diff in report.items():
+        print(f"{name}: max |diff| = {diff:.2e}")
+    sys.exit(0 if all(diff <= tol for diff in report.values()) else 1)
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+from smartserve_common.metrics import Histogram
+
+from cpu_pool import run_cpu
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    """
+    Collects single requests into batches for one vectorized call.
+
+    `fn(items) -> results` runs in the CPU pool for up to `max_batch` queued
+    items at a time. After an idle period a lone request is dispatched
+    straight away; once traffic is arriving faster than batches finish, each
+    batch waits up to `window` seconds after its first item to fill up. At most
+    `max_queue` requests wait at once; beyond that submit() raises QueueFull.
+    """
+
+    def __init__(self, fn, max_batch=64, window=0.005, max_queue=1024, clock=time.monotonic):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window
+        self.max_queue = max_queue
+        self.clock = clock
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self.rejected = 0
+        self.failed_batches = 0
+        self._queue = None
+        self._task = None
+        self._last_size = 1
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction service is shutting down"))
+
+    async def submit(self, item):
+        if self._task is None:
+            # Not started (e.g. used outside the app lifespan): score on its own
+            return (await run_cpu(self.fn, [item]))[0]
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, self.clock()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"{self.max_queue} predictions already queued")
+        return await future
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            # Hold the window only while requests are actually piling up
+            if self._last_size > 1 or not queue.empty():
+                deadline = batch[0][2] + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - self.clock()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch):
+        now = self.clock()
+        for _, _, queued_at in batch:
+            self.queue_wait_ms.observe((now - queued_at) * 1000)
+        self.batch_sizes.observe(len(batch))
+        self._last_size = len(batch)
+
+        try:
+            results = await run_cpu(self.fn, [item for item, _, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():   # the caller may have gone away
+                future.set_result(result)
+
+    def snapshot(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
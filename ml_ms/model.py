@@ -1,20 +1,55 @@
 import os
 import pandas as pd
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 from xgboost import XGBRegressor
 import numpy as np
+from inference import export_booster
+from tuning import BASE_PARAMS, data_fingerprint, print_report, search_params
+
+# Incremental updates: boosting rounds added per run, and how much higher the
+# updated model's validation MSE may be than the current model's before a full retrain
+UPDATE_ROUNDS = 50
+MAX_DEGRADATION = 0.05
+
+def load_preprocessed(preprocessed_path):
+    """Read preprocess output: CSV, or the Feather file from preprocess_data_chunked (memory-mapped)"""
+    if preprocessed_path.endswith((".feather", ".arrow")):
+        import pyarrow.feather as feather
+        return feather.read_table(preprocessed_path, memory_map=True).to_pandas()
+    return pd.read_csv(preprocessed_path)
+
+def data_watermark(X, y):
+    """The training rows a model has seen: count, last date, and a hash to detect rewritten rows"""
+    last = X.iloc[-1]
+    return {"rows": len(X),
+            "last_date": f"{int(last['Year']):04d}-{int(last['Month']):02d}-{int(last['Day']):02d}",
+            "fingerprint": data_fingerprint(X, y)}
+
+def save_model(save_object, model_save_path):
+    os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
+    # Native booster for the fast serving path; written before the pickle so a
+    # watcher reloading on the pickle's change always sees both
+    booster_path = export_booster(save_object["model"], model_save_path)
+    joblib.dump(save_object, model_save_path)
+    print(f"Model saved to: {model_save_path} (booster: {booster_path})")
 
-def train_model(preprocessed_path, model_save_path):
+def train_model(preprocessed_path, model_save_path, search="random", n_iter=10, n_jobs=None,
+                cache_path=None, early_stopping_rounds=None):
     """
     Fixed XGBoost training function that handles API compatibility issues
+
+    search: "random" (every candidate on all rows) or "halving" (successive halving)
+    n_jobs: total cores to use, split between search workers and booster threads
+    cache_path: fold-score cache; defaults to search_cache.json next to the model
+    early_stopping_rounds: early-stop each candidate fit on its validation fold
     """
     if not os.path.exists(preprocessed_path):
         raise FileNotFoundError(f"File not found: {preprocessed_path}")
 
     # Load preprocessed data
-    df = pd.read_csv(preprocessed_path)
+    df = load_preprocessed(preprocessed_path)
     df = df.dropna(subset=["food_waste_kg"])
 
     # Features & target
@@ -27,14 +62,6 @@ def train_model(preprocessed_path, model_save_path):
         X, y, test_size=0.2, random_state=42
     )
 
-    # XGBoost model with fixed parameters
-    xgb = XGBRegressor(
-        objective="reg:squarederror",
-        n_jobs=-1,
-        random_state=42,
-        eval_metric="rmse"
-    )
-
     # Hyperparameter grid
     param_dist = {
         "n_estimators": [100, 200, 300],
@@ -44,22 +71,18 @@ def train_model(preprocessed_path, model_save_path):
         "colsample_bytree": [0.7, 0.9]
     }
 
-    # Randomized Search
-    search = RandomizedSearchCV(
-        estimator=xgb,
-        param_distributions=param_dist,
-        n_iter=10,
-        scoring="r2",
-        cv=3,
-        verbose=1,
-        random_state=42
-    )
-
+    # Parallel search; fold results are cached so reruns only fit new points
+    if cache_path is None:
+        cache_path = os.path.join(os.path.dirname(model_save_path), "search_cache.json")
     print("Starting hyperparameter search...")
-    search.fit(X_train, y_train)
+    best_params, search_report = search_params(
+        X_train, y_train, param_dist, n_iter=n_iter, n_folds=3, strategy=search,
+        cache_path=cache_path, n_jobs=n_jobs, early_stopping_rounds=early_stopping_rounds
+    )
+    print_report(search_report)
 
     # Get best model and refit with early stopping
-    best_model = search.best_estimator_
+    best_model = XGBRegressor(**BASE_PARAMS, **best_params, n_jobs=n_jobs or -1)
     
     # Fixed early stopping implementation
     try:
@@ -85,7 +108,7 @@ def train_model(preprocessed_path, model_save_path):
         'test_r2': r2_score(y_test, y_pred_test)
     }
 
-    print(f"Best parameters: {search.best_params_}")
+    print(f"Best parameters: {best_params}")
     print(f"Train MSE: {metrics['train_mse']:.4f}, Test MSE: {metrics['test_mse']:.4f}")
     print(f"Train R²: {metrics['train_r2']:.4f}, Test R²: {metrics['test_r2']:.4f}")
 
@@ -94,22 +117,121 @@ def train_model(preprocessed_path, model_save_path):
         "model": best_model,
         "order": order,
         "metrics": metrics,
-        "best_params": search.best_params_
+        "best_params": best_params,
+        "search_report": search_report,
+        "watermark": data_watermark(X, y),
+        # Row positions no model has trained on; update_model keeps validating on them
+        "validation_rows": np.flatnonzero(X.index.isin(X_test.index)),
+        "training": {"mode": "full", "rows": len(X)}
     }
-
-    os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
-    joblib.dump(save_object, model_save_path)
-    print(f"Model saved to: {model_save_path}")
+    save_model(save_object, model_save_path)
 
     return best_model, metrics
 
+def update_model(preprocessed_path, model_save_path, rounds=UPDATE_ROUNDS, early_stopping_rounds=10,
+                 max_degradation=MAX_DEGRADATION, n_jobs=None, **search_kwargs):
+    """
+    Warm-start update: continue boosting the saved model on only the rows added
+    after its data watermark, with its saved best_params.
+
+    Falls back to train_model (search + full retrain, with search_kwargs) when
+    the saved model has no watermark, the rows it covers were rewritten (e.g.
+    a full preprocess_data refitted the scaler), or the updated model's validation
+    MSE is more than `max_degradation` above the current model's. Validation is
+    the saved `validation_rows`: train_model's test split plus 20% of the new rows
+    of every update, so no model in the chain has trained on them.
+    """
+    if not os.path.exists(preprocessed_path):
+        raise FileNotFoundError(f"File not found: {preprocessed_path}")
+    if not os.path.exists(model_save_path):
+        print("No saved model, running a full retrain")
+        return train_model(preprocessed_path, model_save_path, n_jobs=n_jobs, **search_kwargs)
+
+    saved = joblib.load(model_save_path)
+    df = load_preprocessed(preprocessed_path)
+    df = df.dropna(subset=["food_waste_kg"])
+    X = df.drop(columns=["food_waste_kg"])
+    y = df["food_waste_kg"]
+
+    watermark = saved.get("watermark")
+    seen = watermark["rows"] if watermark else 0
+    if watermark is None:
+        reason = "the saved model has no data watermark"
+    elif saved.get("validation_rows") is None:
+        reason = "the saved model has no validation rows"
+    elif X.columns.tolist() != saved["order"]:
+        reason = "the feature columns changed"
+    elif len(X) < seen or data_fingerprint(X.iloc[:seen], y.iloc[:seen]) != watermark["fingerprint"]:
+        reason = f"the {seen} rows up to {watermark['last_date']} were rewritten"
+    else:
+        reason = None
+    if reason:
+        print(f"Full retrain: {reason}")
+        return train_model(preprocessed_path, model_save_path, n_jobs=n_jobs, **search_kwargs)
+
+    if len(X) == seen:
+        print(f"No rows after the watermark ({watermark['last_date']}); model unchanged")
+        return saved["model"], saved["metrics"]
+
+    new_rows = np.arange(seen, len(X))
+    if len(new_rows) >= 5:
+        fit_rows, hold_rows = train_test_split(new_rows, test_size=0.2, random_state=42)
+    else:
+        fit_rows, hold_rows = new_rows, new_rows[:0]
+    validation_rows = np.sort(np.concatenate([saved["validation_rows"], hold_rows]))
+    X_fit, y_fit = X.iloc[fit_rows], y.iloc[fit_rows]
+    X_val, y_val = X.iloc[validation_rows], y.iloc[validation_rows]
+
+    # Continue from the trees the current model actually predicts with
+    previous = saved["model"]
+    booster = previous.get_booster()
+    best = booster.attr("best_iteration")
+    if best is not None:
+        booster = booster[:int(best) + 1]
+    print(f"Updating on {len(new_rows)} new rows (after {watermark['last_date']}), up to {rounds} rounds...")
+    model = XGBRegressor(**BASE_PARAMS, **{**saved["best_params"], "n_estimators": rounds},
+                         n_jobs=n_jobs or -1, early_stopping_rounds=early_stopping_rounds)
+    model.fit(X_fit, y_fit, xgb_model=booster, eval_set=[(X_val, y_val)], verbose=False)
+
+    before = mean_squared_error(y_val, previous.predict(X_val))
+    after = mean_squared_error(y_val, model.predict(X_val))
+    print(f"Validation MSE: {before:.4f} -> {after:.4f}")
+    if after > before * (1 + max_degradation):
+        print(f"Full retrain: validation MSE rose more than {max_degradation:.0%}")
+        return train_model(preprocessed_path, model_save_path, n_jobs=n_jobs, **search_kwargs)
+
+    metrics = {
+        'train_mse': mean_squared_error(y_fit, model.predict(X_fit)),
+        'train_r2': r2_score(y_fit, model.predict(X_fit)),
+        'test_mse': after,
+        'test_r2': r2_score(y_val, model.predict(X_val))
+    }
+    save_object = {
+        "model": model,
+        "order": saved["order"],
+        "metrics": metrics,
+        "best_params": saved["best_params"],
+        "search_report": saved.get("search_report"),
+        "watermark": data_watermark(X, y),
+        "validation_rows": validation_rows,
+        "training": {"mode": "incremental", "rows": len(new_rows), "previous_watermark": watermark,
+                     "rounds": model.get_booster().num_boosted_rounds(),
+                     "validation_mse": {"before": before, "after": after}}
+    }
+    save_model(save_object, model_save_path)
+
+    return model, metrics
+
 # Usage
 if __name__ == "__main__":
+    # python model.py [--incremental]
+    import sys
     preprocessed_path = r"../data/processed/preprocessed_data.csv"
     model_save_path = r"../models/food_waste_model.pkl"
-    
+    train = update_model if "--incremental" in sys.argv[1:] else train_model
+
     try:
-        model, metrics = train_model(preprocessed_path, model_save_path)
+        model, metrics = train(preprocessed_path, model_save_path)
         print("Training completed successfully!")
     except Exception as e:
         print(f"Training failed: {str(e)}")
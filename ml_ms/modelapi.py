@@ -1,15 +1,55 @@
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
-import joblib
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field, ValidationError
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+import asyncio
+import os
 import numpy as np
-import requests
-from datetime import date
-import joblib
-import calendar
+from datetime import date, timedelta
+from smartserve_common.metrics import Stages, instrument, registry as metrics
+from smartserve_common.warmup import Warmup, add_health
+import cpu_pool
+from cpu_pool import run_cpu
+from feature_store import store_from_env
+from microbatch import MicroBatcher, QueueFull
+from registry import registry_from_env
+from weather import WeatherUnavailable, forecast_provider_from_env, provider_from_env, reading_for
 
-model_save_path = r"..\models\food_waste_model.pkl"
-app=FastAPI()
-cool=joblib.load(model_save_path)
+registry = registry_from_env()
+weather_provider = provider_from_env()
+forecast_provider = forecast_provider_from_env()
+feature_store = store_from_env()
+stages = Stages("waste")
+# Artifacts load in the background (the gateway may already have, before forking workers)
+warmup = Warmup("waste")
+warmup.add("model", lambda: registry.loaded or registry.load())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The watcher hot-swaps the artifacts when the files change
+    warmup.start()
+    interval = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+    watcher = asyncio.create_task(registry.watch(interval)) if interval > 0 else None
+    feature_store.load()
+    autosave = asyncio.create_task(
+        feature_store.autosave(float(os.environ.get("FEATURE_SNAPSHOT_INTERVAL", 60))))
+    batcher.start()
+    yield
+    warmup.stop()
+    await batcher.stop()
+    if watcher is not None:
+        watcher.cancel()
+    autosave.cancel()
+    feature_store.save()
+    await weather_provider.aclose()
+    await forecast_provider.aclose()
+    cpu_pool.shutdown()
+
+
+app=FastAPI(lifespan=lifespan)
+instrument(app, "waste")
+add_health(app, warmup)
 
 class food(BaseModel):
     meals_served: float
@@ -20,49 +60,125 @@ class food(BaseModel):
     waste_category_MEAT: bool
     waste_category_VEGETABLES: bool
     city: str
+    site: Optional[str] = None   # canteen id; rolling waste history is kept per site (or per city)
 
-API_KEY = "a7e721a9c38d4d8aad6112350252208"   # replace with your valid key
-BASE_URL = "https://api.weatherapi.com/v1/current.json"
+class forecast_site(food):
+    start: date
+    end: date
 
-def get_weather(city: str):
-    try:
-        params = {"key": API_KEY, "q": city}
-        response = requests.get(BASE_URL, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        return {"temperature_C": data["current"]["temp_c"], "humidity_percent": data["current"]["humidity"]}
-    except Exception:
-        return {"temperature_C": 27.0, "humidity_percent": 77.0}
+class observation(BaseModel):
+    city: str
+    site: Optional[str] = None
+    food_waste_kg: float=Field(ge=0)
+
+def calendar_features(dates):
+    """Date feature columns for an array of dates, computed for all of them at once"""
+    d = np.asarray(dates, dtype="datetime64[D]")
+    month = d.astype("datetime64[M]")
+    weekday = (d.astype(np.int64) + 3) % 7      # Monday=0; 1970-01-01 was a Thursday
+    thursday = d + (3 - weekday)                 # an ISO week belongs to the year of its Thursday
+    week_of_year = (thursday - thursday.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.int64) // 7 + 1
+
+    return {
+        "Day": (d - month.astype("datetime64[D]")).astype(np.int64) + 1,
+        "Month": month.astype(np.int64) % 12 + 1,
+        "Year": d.astype("datetime64[Y]").astype(np.int64) + 1970,
+        "DayOfWeek": weekday,
+        "WeekOfYear": week_of_year,
+        "IsWeekend": (weekday >= 5).astype(np.int64),   # Sat(5), Sun(6)
+        "MonthStart": (d == month.astype("datetime64[D]")).astype(np.int64),
+        "MonthEnd": (d == (month + 1).astype("datetime64[D]") - 1).astype(np.int64),
+    }
 
 def get_today_info():
-    d = date.today()
+    return {col: int(values[0]) for col, values in calendar_features([date.today()]).items()}
 
-    iso_year, week_num, _ = d.isocalendar()
-    weekday_num = d.weekday()   # Monday=0, Sunday=6
-    is_weekend = 1 if weekday_num >= 5 else 0  # Sat(5), Sun(6)
+def predict_columns(bundle, n, columns):
+    """Score n rows given as {feature: scalar or length-n sequence}, with one scale + predict call"""
+    x_pred = np.empty((n, len(bundle.order)), dtype=float)
+    for j, col in enumerate(bundle.order):
+        x_pred[:, j] = columns[col]
 
-    # Month start / end flags
-    last_day = calendar.monthrange(d.year, d.month)[1]
-    month_start = 1 if d.day == 1 else 0
-    month_end = 1 if d.day == last_day else 0
+    with stages("scale"):
+        x_pred[:, bundle.numeric_idx] = bundle.scaler.transform(x_pred[:, bundle.numeric_idx])
+    with stages("predict"):
+        return bundle.predictor.predict(x_pred)
 
-    return {
-        "Day": d.day,
-        "Month": d.month,
-        "Year": d.year,
-        "DayOfWeek": weekday_num,   
-        "WeekOfYear": week_num,
-        "IsWeekend": is_weekend,        
-        "MonthStart": month_start,      
-        "MonthEnd": month_end           
-    }
+def predict_rows(rows, weather):
+    """Score a list of validated `food` payloads with one scale + predict call"""
+    bundle = registry.current
+    with stages("features"):
+        # Date features are shared by the whole batch
+        columns = get_today_info()
+        per_row = [{**feature_store.averages(feature_store.key(row.city, row.site), bundle.past),
+                    **weather[row.city], **row.model_dump()} for row in rows]
+        for col in bundle.order:
+            if col not in columns:
+                columns[col] = [r[col] for r in per_row]
+    return predict_columns(bundle, len(rows), columns)
+
+def forecast_rows(sites, forecasts):
+    """
+    Daily predictions over each site's date range. Each day's prediction is
+    appended to a copy of the site's waste history before the next day's
+    3/7-day averages are computed, so day k of every site is scored together:
+    one scale + predict call per horizon day. Returns (dates, predictions,
+    borrowed) per site; borrowed marks days outside the weather forecast.
+    """
+    bundle = registry.current
+    with stages("features"):
+        spans = np.array([(s.end - s.start).days + 1 for s in sites])
+        offsets = np.r_[0, np.cumsum(spans)[:-1]]
+        dates = np.concatenate([np.arange(s.start, s.end + timedelta(days=1), dtype="datetime64[D]")
+                                for s in sites])
+        calendar_cols = calendar_features(dates)
+        readings, borrowed = zip(*[reading_for(forecasts[s.city], str(day))
+                                   for s, first, n in zip(sites, offsets, spans) for day in dates[first:first + n]])
+        borrowed = np.array(borrowed)
+        weather_cols = {col: np.array([r[col] for r in readings]) for col in readings[0]}
+        payloads = [s.model_dump() for s in sites]
+        windows = [feature_store.window(feature_store.key(s.city, s.site)) for s in sites]
+
+    preds = np.empty(len(dates))
+    for day in range(int(spans.max())):
+        active = np.flatnonzero(spans > day)
+        idx = offsets[active] + day
+        with stages("features"):
+            past = [windows[i].averages_or(bundle.past) for i in active]
+            columns = {col: values[idx] for col, values in {**calendar_cols, **weather_cols}.items()}
+            for col in bundle.order:
+                if col not in columns:
+                    source = past if col in past[0] else [payloads[i] for i in active]
+                    columns[col] = [r[col] for r in source]
+        values = predict_columns(bundle, len(active), columns)
+        preds[idx] = values
+        for i, value in zip(active, values.tolist()):
+            windows[i].append(value)
 
-scaler = joblib.load("scaler.pkl")
+    return [(dates[first:first + n], preds[first:first + n], borrowed[first:first + n])
+            for first, n in zip(offsets, spans)]
 
+def predict_queued(items):
+    """Micro-batch callback: items are (row, weather reading) pairs from single /predwaste calls"""
+    rows = [row for row, _ in items]
+    return predict_rows(rows, {row.city: reading for row, reading in items}).tolist()
 
-# Select the same numeric columns as used in training
-numeric_cols = ["meals_served", "kitchen_staff", "temperature_C", "humidity_percent", 
-                "PastWaste_3daysAvg", "PastWaste_7daysAvg"]
+# Single /predwaste calls are queued for up to PREDWASTE_BATCH_WINDOW_MS (or
+# PREDWASTE_BATCH_MAX rows) and scored together; PREDWASTE_QUEUE_MAX bounds the queue
+batcher = MicroBatcher(
+    predict_queued,
+    max_batch=int(os.environ.get("PREDWASTE_BATCH_MAX", 64)),
+    window=float(os.environ.get("PREDWASTE_BATCH_WINDOW_MS", 5)) / 1000,
+    max_queue=int(os.environ.get("PREDWASTE_QUEUE_MAX", 1024)),
+)
+metrics.add_histogram("smartserve_batch_size", "Rows per micro-batch", batcher.batch_sizes, service="waste")
+metrics.add_histogram("smartserve_queue_wait_ms", "Micro-batch queue wait (ms)", batcher.queue_wait_ms, service="waste")
+metrics.add_collector(lambda: [("smartserve_rejected_total", "counter", "Requests refused with a full queue",
+                                {"service": "waste"}, batcher.rejected)])
+metrics.add_cache("weather-forecast", lambda: (forecast_provider.stats["hits"] + forecast_provider.stats["stale"],
+                                               forecast_provider.stats["misses"]))
+metrics.add_cache("weather", lambda: (weather_provider.stats["hits"] + weather_provider.stats["stale"],
+                                      weather_provider.stats["misses"]))
 
 
 @app.get('/')
@@ -72,23 +188,96 @@ async def start():
 
 @app.post('/predwaste')
 async def pred(data : food):
-    allcols=data.model_dump()
-    allcols.pop("city", None)
-    date=get_today_info()
-    past=joblib.load("past.pkl")
-    weather=get_weather(data.city)
-    combined = {**weather, **past, **date, **allcols}
+    try:
+        with stages("weather"):
+            weather = await weather_provider.get(data.city)
+    except WeatherUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        pred_value = await batcher.submit((data, weather))
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Prediction queue is full: {e}",
+                            headers={"Retry-After": "1"})
+    return {'pred': float(pred_value)}
 
-    # 4. Extract features in correct order
-    ordcols = [combined[col] for col in cool["order"]]
-    x_pred = np.array([ordcols], dtype=float)
 
-    # 5. Scale numeric columns used in training
-    numeric_idx = [cool["order"].index(col) for col in numeric_cols if col in cool["order"]]
-    x_pred[:, numeric_idx] = scaler.transform(x_pred[:, numeric_idx])
+@app.get('/predwaste/stats')
+async def pred_stats():
+    """Micro-batching metrics: batch sizes, queue wait (ms) and rejected requests"""
+    return batcher.snapshot()
 
-    # 6. Predict
-    pred_value = cool["model"].predict(x_pred)[0]
 
-    return {'pred': float(pred_value)}
+@app.post('/predwaste/batch')
+async def pred_batch(items : list[Any]):
+    """
+    Score many `food` payloads at once. Results keep the input order; rows that
+    fail validation get an `error` entry instead of failing the whole batch.
+    """
+    results = [None] * len(items)
+    valid, valid_idx = [], []
+    for i, item in enumerate(items):
+        try:
+            valid.append(food.model_validate(item))
+            valid_idx.append(i)
+        except ValidationError as e:
+            errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            results[i] = {"index": i, "error": errors}
+
+    with stages("weather"):
+        weather = await weather_provider.get_many(row.city for row in valid)
+    ready = []
+    for i, row in zip(valid_idx, valid):
+        if isinstance(weather[row.city], Exception):
+            results[i] = {"index": i, "error": [{"loc": ["city"], "msg": str(weather[row.city])}]}
+        else:
+            ready.append((i, row))
+
+    if ready:
+        preds = await run_cpu(predict_rows, [row for _, row in ready], weather)
+        for (i, _), value in zip(ready, preds):
+            results[i] = {"index": i, "pred": float(value)}
+
+    return {"results": results}
+
+
+# Longest date range one forecast request may cover per site
+FORECAST_MAX_DAYS = int(os.environ.get("FORECAST_MAX_DAYS", 31))
+
+
+@app.post('/predwaste/forecast')
+async def forecast(sites : list[forecast_site]):
+    """
+    Daily waste forecast per site over its own start..end range (inclusive).
+    Weather comes from the cached forecast provider; each predicted day feeds
+    the site's past-waste averages for the days after it. Days outside the
+    provider's forecast reuse the nearest forecast day's weather and are flagged
+    in `borrowed_weather`.
+    """
+    if not sites:
+        return {"forecasts": []}
+    for i, site in enumerate(sites):
+        days = (site.end - site.start).days + 1
+        if days < 1 or days > FORECAST_MAX_DAYS:
+            raise HTTPException(status_code=422, detail=f"Site {i}: the range must cover 1 to {FORECAST_MAX_DAYS} days")
+
+    with stages("weather"):
+        forecasts = await forecast_provider.get_many(site.city for site in sites)
+    for reading in forecasts.values():
+        if isinstance(reading, Exception):
+            raise HTTPException(status_code=503, detail=str(reading))
+
+    results = await run_cpu(forecast_rows, sites, forecasts)
+    return {"forecasts": [{"city": site.city, "site": site.site,
+                           "dates": days.astype(str).tolist(), "pred": preds.tolist(),
+                           "borrowed_weather": borrowed.tolist()}
+                          for site, (days, preds, borrowed) in zip(sites, results)]}
+
 
+@app.post('/observations')
+async def ingest(observations : list[observation]):
+    """Append actual waste per site; returns the updated rolling averages"""
+    sites = {}
+    for obs in observations:
+        key = feature_store.key(obs.city, obs.site)
+        sites[key] = feature_store.ingest(key, obs.food_waste_kg)
+    return {"ingested": len(observations), "sites": sites}
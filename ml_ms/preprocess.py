@@ -1,15 +1,22 @@
+import hashlib
+import io
 import os
+import tempfile
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import joblib
 
-def preprocess_data(raw_path, processed_path):
-    if not os.path.exists(raw_path):
-        raise FileNotFoundError(f"Raw data not found: {raw_path}")
-
-    # --- Load dataset ---
-    df = pd.read_csv(raw_path)
+CATEGORICAL_COLS = ["special_event", "waste_category"]
+# Read categoricals as text so every chunk sees the same labels ("1", not "1.0")
+RAW_DTYPES = {col: str for col in CATEGORICAL_COLS}
+SCALE_COLS = ["meals_served", "kitchen_staff", "temperature_C", "humidity_percent","Temp_Humidity","PastWaste_3daysAvg", "PastWaste_7daysAvg"]
+PAST_WINDOWS = {"PastWaste_3daysAvg": 3, "PastWaste_7daysAvg": 7}
+# What preprocess_append needs from the run that wrote scaler.pkl
+STATE_PATH = "preprocess_state.pkl"
 
+def clean_rows(df):
+    """Per-row cleaning and calendar features; categoricals stay as upper-case labels"""
     # Drop ID column if present
     df = df.drop(columns=["ID"], errors="ignore")
     df = df.drop(columns=["staff_experience"], errors="ignore")
@@ -30,13 +37,10 @@ def preprocess_data(raw_path, processed_path):
     df = df.drop(columns=["day_of_week"])
 
     # --- Clean categorical columns ---
-    for col in ["special_event", "waste_category"]:
+    for col in CATEGORICAL_COLS:
         if col in df.columns:
             df[col] = df[col].fillna("NONE").astype(str).str.upper()
 
-    categorical_cols = [c for c in ["special_event", "waste_category"] if c in df.columns]
-    df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
-
     # --- Convert numeric columns ---
     numeric_cols = ["meals_served", "temperature_C", "humidity_percent", "food_waste_kg"]
     for col in numeric_cols:
@@ -47,9 +51,50 @@ def preprocess_data(raw_path, processed_path):
     #df["staff_experience"] = df["staff_experience"].fillna(0)
     df["meals_served"] = df["meals_served"].replace(0, 1)
 
+    return df
+
+def encode_categoricals(df, levels):
+    """Same columns as get_dummies(drop_first=True), but against fixed category levels"""
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            values = df.pop(col)
+            for level in levels[col][1:]:
+                df[f"{col}_{level}"] = values == level
+    return df
+
+def filter_rows(df):
     # --- Drop rows with unrealistic temperature ---
     if "temperature_C" in df.columns:
         df = df[(df["temperature_C"] >= 9) & (df["temperature_C"] <= 40)]
+    return df
+
+def past_waste_averages(waste, history=()):
+    """
+    Trailing 3/7-row means of food_waste_kg, excluding the current row (0 until a
+    full window exists). `history` holds the preceding rows' waste (at least the
+    last 7) so chunks can be stitched; every window is averaged on its own, so the
+    result does not depend on where chunk boundaries fall.
+    """
+    history = np.asarray(history, dtype=float)[-7:]
+    values = np.concatenate([history, np.asarray(waste, dtype=float)])
+    offset, n = len(history), len(values) - len(history)
+    averages = {}
+    for col, window in PAST_WINDOWS.items():
+        avg = np.zeros(n)
+        start = max(offset, window)
+        if len(values) > start:
+            means = np.lib.stride_tricks.sliding_window_view(values[:-1], window).mean(axis=1)
+            avg[start - offset:] = means[start - window:]
+        avg[np.isnan(avg)] = 0
+        averages[col] = avg
+    return averages
+
+def category_levels(df):
+    return {col: sorted(df[col].unique()) for col in CATEGORICAL_COLS if col in df.columns}
+
+def add_features(df, levels, history=()):
+    """Encode, filter and date-sort cleaned rows, then add the trailing waste averages"""
+    df = filter_rows(encode_categoricals(df, levels))
 
     # --- Feature interactions ---
     #df["StaffPerMeal"] = df["kitchen_staff"] / df["meals_served"]
@@ -59,12 +104,52 @@ def preprocess_data(raw_path, processed_path):
     # --- Past waste trends ---
     df = df.sort_values(["Year", "Month", "Day"])
     if "food_waste_kg" in df.columns:
-        df["PastWaste_3daysAvg"] = df["food_waste_kg"].shift(1).rolling(3).mean().fillna(0)
-        df["PastWaste_7daysAvg"] = df["food_waste_kg"].shift(1).rolling(7).mean().fillna(0)
+        df = df.assign(**past_waste_averages(df["food_waste_kg"], history))
+
+    return df
+
+def engineer_features(df):
+    """Turn raw rows into unscaled model features (shared by training and evaluation)"""
+    df = clean_rows(df)
+    return add_features(df, category_levels(df))
+
+def last_date(df):
+    """(year, month, day) of the last dated row, or None"""
+    dated = df.dropna(subset=["Year", "Month", "Day"])
+    if dated.empty:
+        return None
+    last = dated.iloc[-1]
+    return int(last["Year"]), int(last["Month"]), int(last["Day"])
+
+def save_artifacts(scaler, waste_tail, state=None):
+    joblib.dump(scaler, "scaler.pkl")
+    past3 = waste_tail.tail(3).mean()
+    past7 = waste_tail.tail(7).mean()
+    joblib.dump({"PastWaste_7daysAvg" : past7,  "PastWaste_3daysAvg" : past3}, "past.pkl")
+    # A state left by an earlier run would pair preprocess_append with the wrong scaler
+    if state is not None:
+        joblib.dump(state, STATE_PATH)
+    elif os.path.exists(STATE_PATH):
+        os.remove(STATE_PATH)
+
+def raw_state(raw_path):
+    """Size and hash of the raw CSV, so preprocess_append can find the rows added after it"""
+    with open(raw_path, "rb") as f:
+        data = f.read()
+    return {"raw_bytes": len(data), "raw_sha256": hashlib.sha256(data).hexdigest()}
+
+def preprocess_data(raw_path, processed_path):
+    if not os.path.exists(raw_path):
+        raise FileNotFoundError(f"Raw data not found: {raw_path}")
+
+    # --- Load dataset ---
+    state = {"processed_path": processed_path, **raw_state(raw_path)}
+    df = clean_rows(pd.read_csv(raw_path, dtype=RAW_DTYPES))
+    levels = category_levels(df)
+    df = add_features(df, levels)
 
     # --- Scale numeric features ---
-    scale_cols = ["meals_served", "kitchen_staff", "temperature_C", "humidity_percent","Temp_Humidity","PastWaste_3daysAvg", "PastWaste_7daysAvg"]
-    existing_cols = [col for col in scale_cols if col in df.columns]
+    existing_cols = [col for col in SCALE_COLS if col in df.columns]
     scaler = StandardScaler()
     df[existing_cols] = scaler.fit_transform(df[existing_cols])
 
@@ -72,14 +157,152 @@ def preprocess_data(raw_path, processed_path):
     os.makedirs(os.path.dirname(processed_path), exist_ok=True)
     df.to_csv(processed_path, index=False)
     print(f"Preprocessing done! Saved to: {processed_path}")
-    joblib.dump(scaler, "scaler.pkl")
-    past3 = df["food_waste_kg"].tail(3).mean()
-    past7 = df["food_waste_kg"].tail(7).mean()
-    joblib.dump({"PastWaste_7daysAvg" : past7,  "PastWaste_3daysAvg" : past3}, "past.pkl")
+    state.update(levels=levels, columns=df.columns.tolist(), last_date=last_date(df),
+                 waste_tail=df["food_waste_kg"].tail(7).tolist())
+    save_artifacts(scaler, df["food_waste_kg"], state)
+
+    return df
+
+def preprocess_append(raw_path, processed_path):
+    """
+    Nightly path: preprocess only the rows appended to the raw CSV since the
+    last run, scale them with the saved scaler.pkl and append them to the
+    processed CSV. Rows already there are left unchanged, so update_model's
+    watermark still matches and it warm-starts instead of retraining.
+
+    Falls back to preprocess_data (new scaler, every row rewritten) when there is
+    no state from a previous run, the raw rows it read were edited, the new rows
+    bring new category levels or columns, or a new row is dated before the last
+    processed one.
+    """
+    if not os.path.exists(raw_path):
+        raise FileNotFoundError(f"Raw data not found: {raw_path}")
+
+    state = joblib.load(STATE_PATH) if os.path.exists(STATE_PATH) else None
+    with open(raw_path, "rb") as f:
+        data = f.read()
+    if state is None or state["processed_path"] != processed_path or not os.path.exists(processed_path):
+        reason = f"no previous preprocess state for {processed_path}"
+    elif hashlib.sha256(data[:state["raw_bytes"]]).hexdigest() != state["raw_sha256"]:
+        reason = "rows already processed were edited"
+    else:
+        reason = None
+    if reason:
+        print(f"Full preprocess: {reason}")
+        return preprocess_data(raw_path, processed_path)
+
+    added = data[state["raw_bytes"]:]
+    if not added.strip():
+        print(f"No new raw rows; {processed_path} unchanged")
+        return None
+    header = data[:data.index(b"\n") + 1]
+    df = clean_rows(pd.read_csv(io.BytesIO(header + added), dtype=RAW_DTYPES))
+
+    new_levels = {col: sorted(set(values) - set(state["levels"].get(col, [])))
+                  for col, values in category_levels(df).items()}
+    new_levels = {col: values for col, values in new_levels.items() if values}
+    df = add_features(df, state["levels"], state["waste_tail"])
+    first = next(iter(df[["Year", "Month", "Day"]].dropna().astype(int).itertuples(index=False, name=None)), None)
+    if new_levels:
+        reason = f"new category levels {new_levels}"
+    elif df.columns.tolist() != state["columns"]:
+        reason = "the feature columns changed"
+    elif first is not None and state["last_date"] is not None and first < tuple(state["last_date"]):
+        reason = f"new rows start on {first}, before the last processed date {tuple(state['last_date'])}"
+    if reason:
+        print(f"Full preprocess: {reason}")
+        return preprocess_data(raw_path, processed_path)
+
+    # --- Scale with the saved scaler and append ---
+    scaler = joblib.load("scaler.pkl")
+    existing_cols = [col for col in SCALE_COLS if col in df.columns]
+    df[existing_cols] = scaler.transform(df[existing_cols])
+    df.to_csv(processed_path, mode="a", header=False, index=False)
+    print(f"Appended {len(df)} rows to: {processed_path}")
+
+    waste_tail = pd.Series(state["waste_tail"] + df["food_waste_kg"].tolist(), dtype=float).tail(7)
+    state.update(raw_bytes=len(data), raw_sha256=hashlib.sha256(data).hexdigest(),
+                 last_date=last_date(df) or state["last_date"], waste_tail=waste_tail.tolist())
+    save_artifacts(scaler, waste_tail, state)
 
     return df
 
+def preprocess_data_chunked(raw_path, processed_path, chunksize=100_000):
+    """
+    Bounded-memory preprocess_data for large histories. Writes an uncompressed
+    Feather (Arrow IPC) file that train_model memory-maps.
+
+    Pass 1 cleans the raw CSV chunk by chunk and spills rows into per-month
+    buckets on disk. Pass 2 walks the months in date order, carrying the last 7
+    waste values into the rolling averages and partial_fit-ing the scaler. Pass 3
+    scales and appends record batches. Peak memory is one chunk or one month.
+    """
+    import pyarrow as pa
+
+    if not os.path.exists(raw_path):
+        raise FileNotFoundError(f"Raw data not found: {raw_path}")
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        # --- Pass 1: clean, collect category levels, bucket by month ---
+        levels = {}
+        buckets = {}
+        for n, chunk in enumerate(pd.read_csv(raw_path, dtype=RAW_DTYPES, chunksize=chunksize)):
+            chunk = clean_rows(chunk)
+            for col in CATEGORICAL_COLS:
+                if col in chunk.columns:
+                    levels.setdefault(col, set()).update(chunk[col].unique())
+            chunk = filter_rows(chunk)
+            months = chunk["Year"] * 100 + chunk["Month"]
+            for month, part in chunk.groupby(months, dropna=False, sort=False):
+                key = np.inf if pd.isna(month) else int(month)   # undated rows sort last
+                path = os.path.join(spill_dir, f"raw_{key}_{n}.pkl")
+                part.to_pickle(path)
+                buckets.setdefault(key, []).append(path)
+        levels = {col: sorted(values) for col, values in levels.items()}
+
+        # --- Pass 2: rolling features across month boundaries, incremental scaler fit ---
+        scaler = StandardScaler()
+        history = pd.Series(dtype=float)
+        features = []
+        for key in sorted(buckets):
+            df = pd.concat([pd.read_pickle(p) for p in buckets[key]])
+            df = encode_categoricals(df, levels).sort_values(["Year", "Month", "Day"])
+            if "food_waste_kg" in df.columns:
+                df = df.assign(**past_waste_averages(df["food_waste_kg"], history))
+                history = pd.concat([history, df["food_waste_kg"]]).tail(7)
+            existing_cols = [col for col in SCALE_COLS if col in df.columns]
+            scaler.partial_fit(df[existing_cols])
+            path = os.path.join(spill_dir, f"features_{len(features)}.pkl")
+            df.to_pickle(path)
+            features.append(path)
+
+        if not features:
+            raise ValueError(f"No rows left to write from: {raw_path}")
+
+        # --- Pass 3: scale and append to the Feather file ---
+        os.makedirs(os.path.dirname(processed_path), exist_ok=True)
+        writer = None
+        try:
+            for path in features:
+                df = pd.read_pickle(path)
+                df[existing_cols] = scaler.transform(df[existing_cols])
+                # One schema for every batch: calendar ints may be float in chunks with missing dates
+                df = df.astype({col: "float64" for col in df.columns if df[col].dtype != bool})
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pa.ipc.new_file(processed_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    print(f"Preprocessing done! Saved to: {processed_path}")
+    save_artifacts(scaler, history)
+
 if __name__ == "__main__":
-    raw_path = r"..\data\raw\train.csv"
-    processed_path= r"..\data\processed\preprocessed_data.csv"
-    preprocess_data(raw_path, processed_path)
+    # python preprocess.py [--append]
+    import sys
+    raw_path = r"../data/raw/train.csv"
+    processed_path= r"../data/processed/preprocessed_data.csv"
+    preprocess = preprocess_append if "--append" in sys.argv[1:] else preprocess_data
+    preprocess(raw_path, processed_path)
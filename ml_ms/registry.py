@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import io
+import os
+
+from smartserve_common.metrics import Stages
+from smartserve_common.warmup import NotReady
+
+from inference import booster_path_for, select_predictor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+stages = Stages("waste")
+
+# Columns scaled by the StandardScaler fitted in preprocess.py, in scaler order
+NUMERIC_COLS = ["meals_served", "kitchen_staff", "temperature_C", "humidity_percent",
+                "PastWaste_3daysAvg", "PastWaste_7daysAvg"]
+
+
+class ModelBundle:
+    """One consistent set of loaded artifacts; never mutated after creation"""
+
+    def __init__(self, model_pkg, scaler, past, signature, booster_path=None, backend="auto"):
+        self.model = model_pkg["model"]
+        self.order = model_pkg["order"]
+        self.meta = {k: v for k, v in model_pkg.items() if k != "model"}
+        self.scaler = scaler
+        self.past = past
+        self.signature = signature
+
+        self.col_idx = {col: j for j, col in enumerate(self.order)}
+        self.numeric_idx = [self.col_idx[col] for col in NUMERIC_COLS if col in self.col_idx]
+        if getattr(scaler, "n_features_in_", len(self.numeric_idx)) != len(self.numeric_idx):
+            raise ValueError("Scaler does not match the model's numeric columns")
+        self.predictor = select_predictor(self.model, len(self.order), booster_path, backend)
+
+
+class ModelRegistry:
+    """
+    Holds the current ModelBundle. Reloads build a complete new bundle and swap
+    the reference in one assignment, so a request that already picked up the
+    old bundle finishes with it.
+    """
+
+    def __init__(self, model_path, scaler_path, past_path, backend="auto"):
+        self.paths = (model_path, scaler_path, past_path)
+        self.backend = backend
+        self._bundle = None
+        self._stamp = None
+        self.reloads = 0
+
+    @property
+    def current(self):
+        if self._bundle is None:
+            raise NotReady("model artifacts are not loaded yet")
+        return self._bundle
+
+    @property
+    def loaded(self):
+        return self._bundle is not None
+
+    def _stat(self):
+        return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, self.paths))
+
+    def _read(self):
+        stamp = self._stat()
+        blobs = []
+        for path in self.paths:
+            with open(path, "rb") as f:
+                blobs.append(f.read())
+        return stamp, blobs, hashlib.sha256(b"".join(blobs)).hexdigest()
+
+    def _install(self, stamp, blobs, signature):
+        # Imported here: joblib, and the xgboost/sklearn modules the pickle pulls in, are slow to import
+        import joblib
+        with stages("load"):
+            model_pkg, scaler, past = (joblib.load(io.BytesIO(blob)) for blob in blobs)
+        self._bundle = ModelBundle(model_pkg, scaler, past, signature,
+                                   booster_path=booster_path_for(self.paths[0]), backend=self.backend)
+        self._stamp = stamp
+        return self._bundle
+
+    def load(self):
+        return self._install(*self._read())
+
+    def reload_if_changed(self):
+        """Reload when any artifact's mtime/size changed and its content hash differs"""
+        if self._stat() == self._stamp:
+            return False
+        stamp, blobs, signature = self._read()
+        if self._bundle is not None and signature == self._bundle.signature:
+            self._stamp = stamp
+            return False
+        bundle = self._install(stamp, blobs, signature)
+        self.reloads += 1
+        print(f"Reloaded model artifacts ({bundle.signature[:12]})")
+        return True
+
+    async def watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if self._bundle is None:
+                continue   # the first load belongs to the warm-up
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                # Typically a file caught mid-write; retry on the next tick
+                print(f"Model reload failed, keeping current artifacts: {e}")
+
+
+def registry_from_env():
+    """Registry for the MODEL_PATH / SCALER_PATH / PAST_PATH artifacts and MODEL_BACKEND choice"""
+    return ModelRegistry(
+        model_path=os.environ.get("MODEL_PATH", os.path.join(BASE_DIR, "..", "models", "food_waste_model.pkl")),
+        scaler_path=os.environ.get("SCALER_PATH", os.path.join(BASE_DIR, "scaler.pkl")),
+        past_path=os.environ.get("PAST_PATH", os.path.join(BASE_DIR, "past.pkl")),
+        backend=os.environ.get("MODEL_BACKEND", "auto"),
+    )
@@ -1,11 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional, Union
+import asyncio
 import numpy as np
+import re
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import joblib
+from functools import lru_cache
 import os
+from smartserve_common.metrics import Stages, instrument, registry as metrics
+from smartserve_common.warmup import Warmup, add_health
+from expiry_index import ExpiryIndex
+from impact_ledger import ledger_from_env
+from cpu_pool import run_cpu
 
-app = FastAPI()
+impact_ledger = ledger_from_env()
+# Nothing heavy to load: the tables are module constants and the ledger loads before serving
+warmup = Warmup("shelf-life")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Totals from the last snapshot plus the events logged since
+    replayed = impact_ledger.load()
+    if replayed:
+        print(f"Impact ledger: replayed {replayed} events")
+    warmup.start()
+    autosave = asyncio.create_task(
+        impact_ledger.autosave(float(os.environ.get("IMPACT_SNAPSHOT_INTERVAL", 60))))
+    yield
+    autosave.cancel()
+    impact_ledger.save()
+    impact_ledger.close()
+
+
+app = FastAPI(lifespan=lifespan)
+instrument(app, "shelf-life")
+add_health(app, warmup)
+stages = Stages("shelf-life")
 
 # Food shelf life base values (in hours) at optimal conditions (4°C, 60% humidity)
 FOOD_SHELF_LIFE_BASE = {
@@ -38,6 +71,19 @@ class FoodShelfLifeRequest(BaseModel):
     temperature: float = Field(..., ge=-10, le=50, description="Temperature in Celsius")
     humidity: float = Field(..., ge=0, le=100, description="Humidity percentage")
 
+class FoodShelfLifeBatchRequest(BaseModel):
+    items: list[FoodShelfLifeRequest] = Field(..., description="Inventory items to score in one call")
+
+class InventoryItem(FoodShelfLifeRequest):
+    itemId: str = Field(..., description="Caller's id for the stored item")
+
+class InventoryRegisterRequest(BaseModel):
+    items: list[InventoryItem]
+
+class StorageReading(BaseModel):
+    temperature: float = Field(..., ge=-10, le=50, description="Temperature in Celsius")
+    humidity: float = Field(..., ge=0, le=100, description="Humidity percentage")
+
 class FoodShelfLifeResponse(BaseModel):
     foodItem: str
     foodCategory: str
@@ -53,6 +99,14 @@ class ImpactTrackingRequest(BaseModel):
     userId: str = Field(..., description="User ID")
     userType: str = Field(..., description="Type of user: student, ngo, staff, organiser, admin, canteen")
 
+class ImpactEvent(BaseModel):
+    userId: str
+    userType: str = Field(..., description="Type of user: student, ngo, staff, organiser, admin, canteen")
+    kind: Literal["donation", "consumption"] = Field(..., description="Food given away, or surplus food taken/eaten")
+    foodKg: float = Field(..., ge=0, description="Food kept from waste, in kg")
+    meals: Optional[int] = Field(None, ge=0, description="Meals provided (default: estimated from foodKg)")
+    timestamp: Optional[datetime] = None
+
 class ImpactTrackingResponse(BaseModel):
     userId: str
     userType: str
@@ -78,6 +132,33 @@ class SurplusPredictionResponse(BaseModel):
     estimatedWaste: float
     potentialSavings: float
 
+# Largest grid one sweep request may evaluate, and the largest value a range may reach
+MAX_SWEEP_POINTS = 200_000
+MAX_RANGE_VALUE = 1_000_000
+
+class GridRange(BaseModel):
+    start: int = Field(..., ge=1)
+    stop: int = Field(..., le=MAX_RANGE_VALUE, description="Inclusive")
+    step: int = Field(1, ge=1)
+
+    def __len__(self):
+        # O(1): checked against MAX_SWEEP_POINTS before values() builds anything
+        return len(range(self.start, self.stop + 1, self.step))
+
+    def values(self):
+        return list(range(self.start, self.stop + 1, self.step))
+
+SweepValues = Union[Annotated[list[int], Field(max_length=MAX_SWEEP_POINTS)], GridRange]
+
+class SurplusSweepRequest(BaseModel):
+    guestCount: SweepValues = Field(..., description="Guest counts, or {start, stop, step}")
+    eventType: list[str] = Field(..., min_length=1, max_length=MAX_SWEEP_POINTS)
+    mealType: list[str] = Field(..., min_length=1, max_length=MAX_SWEEP_POINTS)
+    duration: SweepValues = Field(..., description="Hours (1-24), or {start, stop, step}")
+    pareto: bool = Field(False, description="Only configurations on the guest count / surplus Pareto front")
+    top: Optional[int] = Field(None, ge=1, description="Only the N configurations with the lowest sortBy")
+    sortBy: Literal["estimatedWaste", "predictedSurplus", "surplusPercentage", "potentialSavings"] = "estimatedWaste"
+
 def calculate_temperature_factor(temp):
     """Calculate temperature factor affecting shelf life"""
     if temp <= 4:  # Refrigeration
@@ -122,120 +203,216 @@ def get_base_shelf_life(food_item, category):
     }
     return category_defaults.get(category, 48)
 
-def calculate_user_impact(user_type):
-    """Calculate impact based on user type"""
-    # Mock impact calculations - in real implementation, this would fetch from database
-    impact_data = {
-        "student": {
-            "foodWasteReduced": 15.5,
-            "carbonFootprintSaved": 8.2,
-            "mealsSaved": 25,
-            "impactScore": 75.5
-        },
-        "ngo": {
-            "foodWasteReduced": 125.0,
-            "carbonFootprintSaved": 65.8,
-            "mealsSaved": 200,
-            "impactScore": 92.3
-        },
-        "staff": {
-            "foodWasteReduced": 45.2,
-            "carbonFootprintSaved": 23.7,
-            "mealsSaved": 75,
-            "impactScore": 81.8
-        },
-        "organiser": {
-            "foodWasteReduced": 89.7,
-            "carbonFootprintSaved": 47.1,
-            "mealsSaved": 150,
-            "impactScore": 88.9
-        },
-        "admin": {
-            "foodWasteReduced": 250.0,
-            "carbonFootprintSaved": 131.5,
-            "mealsSaved": 400,
-            "impactScore": 95.2
-        },
-        "canteen": {
-            "foodWasteReduced": 67.3,
-            "carbonFootprintSaved": 35.4,
-            "mealsSaved": 110,
-            "impactScore": 85.1
-        }
+# Vectorized versions of the factor tables above, for whole inventories
+TEMPERATURE_BOUNDS = np.array([4, 10, 20, 30])
+TEMPERATURE_FACTORS = np.array([1.0, 0.7, 0.4, 0.2, 0.1])
+
+def temperature_factors(temps):
+    """calculate_temperature_factor for an array of temperatures"""
+    return TEMPERATURE_FACTORS[np.searchsorted(TEMPERATURE_BOUNDS, temps, side="left")]
+
+def humidity_factors(humidity):
+    """calculate_humidity_factor for an array of humidity readings"""
+    return np.select([(humidity >= 40) & (humidity <= 70), humidity < 40, humidity <= 85],
+                     [1.0, 0.8, 0.6], 0.3)
+
+@lru_cache(maxsize=4096)
+def cached_base_shelf_life(food_item, category):
+    """get_base_shelf_life memoized per (item, category); the item table never changes at runtime"""
+    return get_base_shelf_life(food_item, category)
+
+def base_shelf_lives(food_items, categories):
+    """Base shelf life per item, resolving each distinct (item, category) pair once"""
+    pairs = list(zip(food_items, categories))
+    unique = {pair: i for i, pair in enumerate(dict.fromkeys(pairs))}
+    table = np.array([cached_base_shelf_life(item, cat) for item, cat in unique], dtype=float)
+    return table[np.fromiter((unique[pair] for pair in pairs), dtype=np.intp, count=len(pairs))]
+
+def risk_levels(remaining_hours):
+    return np.where(remaining_hours > 24, "LOW", np.where(remaining_hours > 6, "MEDIUM", "HIGH"))
+
+def risk_level(remaining_hours):
+    return "LOW" if remaining_hours > 24 else "MEDIUM" if remaining_hours > 6 else "HIGH"
+
+def shelf_life_hours(food_item, category, temperature, humidity):
+    """Predicted shelf life in hours under a fixed storage reading"""
+    return (cached_base_shelf_life(food_item, category)
+            * calculate_temperature_factor(temperature) * calculate_humidity_factor(humidity))
+
+metrics.add_cache("shelf-life-base", lambda: cached_base_shelf_life.cache_info()[:2])
+
+# Registered inventory ordered by expiry, for "what is about to expire" queries; items
+# expired for longer than INVENTORY_EXPIRED_RETENTION_HOURS are dropped
+expiry_index = ExpiryIndex(shelf_life_hours,
+                           retain_expired_hours=float(os.environ.get("INVENTORY_EXPIRED_RETENTION_HOURS", 24)))
+
+def parse_hours(value):
+    """'6h', '1.5h' or '6' -> hours"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*h?\s*", value)
+    if not match:
+        raise HTTPException(status_code=422, detail=f"Invalid duration: {value!r} (expected e.g. '6h')")
+    return float(match.group(1))
+
+def tracked_item_summary(item, now):
+    remaining_hours = (item.expires_at - now) / 3600
+    return {
+        "itemId": item.item_id,
+        "foodItem": item.food_item,
+        "foodCategory": item.category,
+        "temperature": item.temperature,
+        "humidity": item.humidity,
+        "expiresAt": datetime.fromtimestamp(item.expires_at),
+        "remainingHours": round(remaining_hours, 2),
+        "isSafeToEat": remaining_hours > 0,
+        "riskLevel": risk_level(remaining_hours),
     }
-    
-    return impact_data.get(user_type, {
-        "foodWasteReduced": 0.0,
-        "carbonFootprintSaved": 0.0,
-        "mealsSaved": 0,
-        "impactScore": 0.0
-    })
+
+# Base surplus percentages by event type
+EVENT_TYPE_FACTORS = {
+    "wedding": 0.25,  # 25% surplus typically
+    "corporate": 0.15,  # 15% surplus
+    "birthday": 0.20,  # 20% surplus
+    "conference": 0.10,  # 10% surplus
+    "party": 0.30,  # 30% surplus
+    "meeting": 0.05,  # 5% surplus
+    "default": 0.15
+}
+
+# Meal type adjustments
+MEAL_TYPE_FACTORS = {
+    "breakfast": 0.8,  # Less waste for breakfast
+    "lunch": 1.0,  # Standard
+    "dinner": 1.2,  # More waste for dinner
+    "snacks": 0.6,  # Less waste for snacks
+    "default": 1.0
+}
+
+FOOD_PER_GUEST_KG = 0.5   # average food per person per meal
+SAVINGS_PER_KG = 10       # $ per kg of food
+WASTE_SHARE = 0.3         # share of the surplus that becomes waste
+
+# Recommendations added when a rule fires, keyed by the bit used in sweep results
+SURPLUS_RECOMMENDATIONS = {
+    1: ["Consider reducing portion sizes", "Plan for multiple meal services"],      # surplus > 25%
+    2: ["Implement buffet-style serving", "Set up donation partnerships"],          # > 100 guests
+    4: ["Plan for multiple meal breaks", "Consider food preservation methods"],     # > 6 hours
+}
+ALWAYS_RECOMMENDED = ["Coordinate with local NGOs for surplus distribution",
+                      "Use real-time tracking for better planning"]
+
+def surplus_flags(surplus_percentage, guest_count, duration):
+    """Bitmask of the SURPLUS_RECOMMENDATIONS rules that apply; works on scalars and arrays"""
+    return (1 * (surplus_percentage > 0.25) + 2 * (guest_count > 100) + 4 * (duration > 6))
 
 def predict_surplus(event_name, guest_count, event_type, meal_type, duration):
     """Predict surplus based on event details"""
-    
-    # Base surplus percentages by event type
-    event_type_factors = {
-        "wedding": 0.25,  # 25% surplus typically
-        "corporate": 0.15,  # 15% surplus
-        "birthday": 0.20,  # 20% surplus
-        "conference": 0.10,  # 10% surplus
-        "party": 0.30,  # 30% surplus
-        "meeting": 0.05,  # 5% surplus
-        "default": 0.15
-    }
-    
-    # Meal type adjustments
-    meal_type_factors = {
-        "breakfast": 0.8,  # Less waste for breakfast
-        "lunch": 1.0,  # Standard
-        "dinner": 1.2,  # More waste for dinner
-        "snacks": 0.6,  # Less waste for snacks
-        "default": 1.0
-    }
-    
+
     # Duration adjustments
     duration_factor = min(1.5, max(0.5, duration / 4))  # Normalize to 4-hour baseline
-    
+
     # Calculate base surplus
-    base_factor = event_type_factors.get(event_type.lower(), event_type_factors["default"])
-    meal_factor = meal_type_factors.get(meal_type.lower(), meal_type_factors["default"])
-    
+    base_factor = EVENT_TYPE_FACTORS.get(event_type.lower(), EVENT_TYPE_FACTORS["default"])
+    meal_factor = MEAL_TYPE_FACTORS.get(meal_type.lower(), MEAL_TYPE_FACTORS["default"])
+
     # Calculate surplus percentage
     surplus_percentage = base_factor * meal_factor * duration_factor
-    
+
     # Calculate predicted surplus (in kg)
-    # Assume average 0.5kg food per person per meal
-    base_food_per_person = 0.5
-    total_food = guest_count * base_food_per_person
+    total_food = guest_count * FOOD_PER_GUEST_KG
     predicted_surplus = total_food * surplus_percentage
-    
-    # Calculate potential savings (assuming $10 per kg of food)
-    potential_savings = predicted_surplus * 10
-    
+
+    # Calculate potential savings
+    potential_savings = predicted_surplus * SAVINGS_PER_KG
+
     # Generate recommendations
-    recommendations = []
-    if surplus_percentage > 0.25:
-        recommendations.append("Consider reducing portion sizes")
-        recommendations.append("Plan for multiple meal services")
-    if guest_count > 100:
-        recommendations.append("Implement buffet-style serving")
-        recommendations.append("Set up donation partnerships")
-    if duration > 6:
-        recommendations.append("Plan for multiple meal breaks")
-        recommendations.append("Consider food preservation methods")
-    
-    recommendations.append("Coordinate with local NGOs for surplus distribution")
-    recommendations.append("Use real-time tracking for better planning")
-    
+    flags = surplus_flags(surplus_percentage, guest_count, duration)
+    recommendations = [text for bit, texts in SURPLUS_RECOMMENDATIONS.items() if flags & bit for text in texts]
+    recommendations += ALWAYS_RECOMMENDED
+
     return {
         "predictedSurplus": round(predicted_surplus, 2),
         "surplusPercentage": round(surplus_percentage * 100, 1),
         "recommendedActions": recommendations,
-        "estimatedWaste": round(predicted_surplus * 0.3, 2),  # 30% of surplus becomes waste
+        "estimatedWaste": round(predicted_surplus * WASTE_SHARE, 2),
         "potentialSavings": round(potential_savings, 2)
     }
 
+def round_half(values, ndigits):
+    """np.round that agrees with Python's round(): near-ties are re-rounded one by one"""
+    scaled = values * 10.0 ** ndigits
+    rounded = np.round(scaled) / 10.0 ** ndigits
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    rounded[near_tie] = [round(v, ndigits) for v in values[near_tie].tolist()]
+    return rounded
+
+def pareto_front(guests, surplus):
+    """
+    Mask of configurations no other one beats: none serves at least as many
+    guests with less surplus, or more guests with the same surplus.
+    """
+    order = np.lexsort((surplus, -guests))              # most guests first, then least surplus
+    g, s = guests[order], surplus[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    group_min = np.minimum.reduceat(s, starts)
+    # Least surplus among strictly larger guest counts, per guest-count group
+    better = np.r_[np.inf, np.minimum.accumulate(group_min)[:-1]]
+    sizes = np.diff(np.r_[starts, len(g)])
+    keep = (s == np.repeat(group_min, sizes)) & (s < np.repeat(better, sizes))
+    mask = np.zeros(len(g), dtype=bool)
+    mask[order[keep]] = True
+    return mask
+
+def surplus_grid(guest_counts, event_types, meal_types, durations, pareto=False, top=None, sort_by="estimatedWaste"):
+    """
+    predict_surplus over the full grid of the given values, broadcast in NumPy.
+    Rows are ordered guest count, then event type, meal type and duration (last
+    varies fastest). `pareto` keeps only the guest-count/surplus Pareto front;
+    `top` keeps the N rows with the lowest `sort_by` (input order on ties).
+    """
+    with stages("predict"):
+        guests = np.asarray(guest_counts, dtype=np.int64)
+        days = np.asarray(durations, dtype=np.int64)
+        base = np.array([EVENT_TYPE_FACTORS.get(t.lower(), EVENT_TYPE_FACTORS["default"]) for t in event_types])
+        meal = np.array([MEAL_TYPE_FACTORS.get(t.lower(), MEAL_TYPE_FACTORS["default"]) for t in meal_types])
+        duration_factor = np.minimum(1.5, np.maximum(0.5, days / 4))
+
+        # Axes: guests, event type, meal type, duration; same operation order as predict_surplus
+        pct = base[:, None, None] * meal[None, :, None] * duration_factor[None, None, :]
+        surplus = (guests * FOOD_PER_GUEST_KG)[:, None, None, None] * pct[None]
+        shape = surplus.shape
+        idx = [i.ravel() for i in np.indices(shape, dtype=np.intp)]
+        surplus, pct = surplus.ravel(), np.broadcast_to(pct[None], shape).ravel()
+        # Unrounded until the returned rows are chosen: (scale, decimals)
+        columns = {
+            "predictedSurplus": (surplus, 2),
+            "surplusPercentage": (pct * 100, 1),
+            "estimatedWaste": (surplus * WASTE_SHARE, 2),
+            "potentialSavings": (surplus * SAVINGS_PER_KG, 2),
+        }
+
+        rows = np.arange(surplus.size)
+        if pareto:
+            rows = rows[pareto_front(guests[idx[0]], surplus)]
+        if top is not None:
+            rows = rows[np.argsort(columns[sort_by][0][rows], kind="stable")[:top]]
+
+    with stages("serialize"):
+        g, e, m, d = (i[rows] for i in idx)
+        return {
+            "count": int(surplus.size),
+            "returned": int(len(rows)),
+            "columns": {
+                "guestCount": guests[g].tolist(),
+                "eventType": np.asarray(event_types, dtype=object)[e].tolist(),
+                "mealType": np.asarray(meal_types, dtype=object)[m].tolist(),
+                "duration": days[d].tolist(),
+                **{name: round_half(col[rows], ndigits).tolist() for name, (col, ndigits) in columns.items()},
+                "recommendationFlags": surplus_flags(pct[rows], guests[g], days[d]).tolist(),
+            },
+            "recommendations": {**{str(bit): texts for bit, texts in SURPLUS_RECOMMENDATIONS.items()},
+                                "always": ALWAYS_RECOMMENDED},
+        }
+
 @app.get('/')
 async def root():
     return {"message": "Food Shelf Life Prediction API"}
@@ -243,15 +420,16 @@ async def root():
 @app.post('/predict-shelf-life', response_model=FoodShelfLifeResponse)
 async def predict_shelf_life(request: FoodShelfLifeRequest):
     try:
-        # Get base shelf life
-        base_shelf_life = get_base_shelf_life(request.foodItem, request.foodCategory)
-        
-        # Calculate environmental factors
-        temp_factor = calculate_temperature_factor(request.temperature)
-        humidity_factor = calculate_humidity_factor(request.humidity)
-        
-        # Calculate predicted shelf life
-        predicted_shelf_life = base_shelf_life * temp_factor * humidity_factor
+        with stages("predict"):
+            # Get base shelf life
+            base_shelf_life = get_base_shelf_life(request.foodItem, request.foodCategory)
+
+            # Calculate environmental factors
+            temp_factor = calculate_temperature_factor(request.temperature)
+            humidity_factor = calculate_humidity_factor(request.humidity)
+
+            # Calculate predicted shelf life
+            predicted_shelf_life = base_shelf_life * temp_factor * humidity_factor
         
         # Calculate expiration time
         expires_at = datetime.now() + timedelta(hours=predicted_shelf_life)
@@ -283,12 +461,80 @@ async def predict_shelf_life(request: FoodShelfLifeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+def shelf_life_columns(items):
+    """Columnar shelf-life predictions for many items, computed with NumPy"""
+    with stages("features"):
+        food_items = [item.foodItem for item in items]
+        categories = [item.foodCategory for item in items]
+        temperature = np.fromiter((item.temperature for item in items), dtype=float, count=len(items))
+        humidity = np.fromiter((item.humidity for item in items), dtype=float, count=len(items))
+
+    with stages("predict"):
+        predicted = (base_shelf_lives(food_items, categories)
+                     * temperature_factors(temperature) * humidity_factors(humidity))
+        expires_at = np.datetime64(datetime.now(), "us") + np.round(predicted * 3.6e9).astype("timedelta64[us]")
+
+    with stages("serialize"):
+        return {
+            "foodItem": food_items,
+            "foodCategory": categories,
+            "predictedShelfLife": np.round(predicted, 2).tolist(),
+            "expiresAt": expires_at.astype(str).tolist(),
+            "remainingHours": np.round(predicted, 2).tolist(),
+            "isSafeToEat": (predicted > 0).tolist(),
+            "riskLevel": risk_levels(predicted).tolist(),
+        }
+
+@app.post('/predict-shelf-life/batch')
+async def predict_shelf_life_batch(request: FoodShelfLifeBatchRequest):
+    """
+    Shelf life for a whole inventory in one call, computed with NumPy over the
+    base-life and factor tables. The response is columnar: one array per field,
+    in input order.
+    """
+    try:
+        columns = await run_cpu(shelf_life_columns, request.items)
+        return {"count": len(request.items), "columns": columns}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@app.post('/inventory')
+async def register_inventory(request: InventoryRegisterRequest):
+    """Track stored items in the expiry index (re-registering an itemId replaces it)"""
+    now = expiry_index.clock()
+    items = [expiry_index.add(item.itemId, item.foodItem, item.foodCategory,
+                              item.temperature, item.humidity) for item in request.items]
+    return {"tracked": len(expiry_index), "items": [tracked_item_summary(item, now) for item in items]}
+
+@app.patch('/inventory/{item_id}/reading')
+async def update_inventory_reading(item_id: str, reading: StorageReading):
+    """New storage reading for a tracked item; its expiry is recomputed from the life left"""
+    if item_id not in expiry_index.items:
+        raise HTTPException(status_code=404, detail=f"Item not tracked: {item_id}")
+    item = expiry_index.update_reading(item_id, reading.temperature, reading.humidity)
+    return tracked_item_summary(item, expiry_index.clock())
+
+@app.delete('/inventory/{item_id}')
+async def remove_inventory_item(item_id: str):
+    if not expiry_index.remove(item_id):
+        raise HTTPException(status_code=404, detail=f"Item not tracked: {item_id}")
+    return {"removed": item_id, "tracked": len(expiry_index)}
+
+@app.get('/expiring')
+async def get_expiring(within: str = Query("24h", description="Time window, e.g. '6h'")):
+    """Tracked items expiring within the window (already expired ones included), soonest first"""
+    hours = parse_hours(within)
+    now = expiry_index.clock()
+    items = [tracked_item_summary(item, now) for item in expiry_index.expiring(hours)]
+    return {"withinHours": hours, "count": len(items), "items": items}
+
 @app.post('/track-impact', response_model=ImpactTrackingResponse)
 async def track_impact(request: ImpactTrackingRequest):
     try:
-        # Calculate impact based on user type
-        impact_data = calculate_user_impact(request.userType)
-        
+        # Running totals from the impact ledger
+        impact_data = impact_ledger.user(request.userId).as_dict()
+
         # Generate impact message
         impact_message = f"Great work! You've helped reduce {impact_data['foodWasteReduced']}kg of food waste, saved {impact_data['carbonFootprintSaved']}kg CO2, and provided {impact_data['mealsSaved']} meals to those in need."
         
@@ -305,17 +551,39 @@ async def track_impact(request: ImpactTrackingRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Impact tracking error: {str(e)}")
 
+@app.post('/impact/events')
+async def record_impact(events: list[ImpactEvent]):
+    """Append donation/consumption events; returns the updated totals of the users involved"""
+    touched = impact_ledger.record([event.model_dump(mode="json", exclude_none=True) for event in events])
+    return {"recorded": len(events), "users": {user_id: totals.as_dict() for user_id, totals in touched.items()}}
+
+@app.get('/leaderboard')
+async def leaderboard(
+    limit: int = Query(10, ge=1, le=1000),
+    userType: Optional[str] = Query(None, description="Only users of this type"),
+):
+    """Top users by impact score, read from the ledger's running totals"""
+    board = impact_ledger.leaderboard(limit, userType)
+    return {"leaderboard": [{"rank": rank, "userId": user_id, "userType": user_type, **totals.as_dict()}
+                            for rank, (user_id, user_type, totals) in enumerate(board, 1)]}
+
+@app.get('/impact/roles')
+async def impact_by_role():
+    """Running totals per user type"""
+    return {role: totals.as_dict() for role, totals in sorted(impact_ledger.roles.items())}
+
 @app.post('/predict-surplus', response_model=SurplusPredictionResponse)
 async def predict_surplus_endpoint(request: SurplusPredictionRequest):
     try:
         # Predict surplus based on event details
-        prediction_data = predict_surplus(
-            request.eventName,
-            request.guestCount,
-            request.eventType,
-            request.mealType,
-            request.duration
-        )
+        with stages("predict"):
+            prediction_data = predict_surplus(
+                request.eventName,
+                request.guestCount,
+                request.eventType,
+                request.mealType,
+                request.duration
+            )
         
         return SurplusPredictionResponse(
             eventName=request.eventName,
@@ -330,6 +598,30 @@ async def predict_surplus_endpoint(request: SurplusPredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Surplus prediction error: {str(e)}")
 
+@app.post('/predict-surplus/sweep')
+async def predict_surplus_sweep(request: SurplusSweepRequest):
+    """
+    Evaluate /predict-surplus over every combination of the given guest counts,
+    event types, meal types and durations in one call. The response is columnar
+    (one array per field); recommendationFlags is a bitmask of the rules in
+    `recommendations`.
+    """
+    # Size the grid from the range lengths first; lists are only built for grids within the limit
+    points = (len(request.guestCount) * len(request.eventType) * len(request.mealType)
+              * len(request.duration))
+    if points > MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=422, detail=f"Grid has {points} points; the limit is {MAX_SWEEP_POINTS}")
+    guests, durations = (v.values() if isinstance(v, GridRange) else v
+                         for v in (request.guestCount, request.duration))
+    if not guests or min(guests) < 1:
+        raise HTTPException(status_code=422, detail="guestCount values must be >= 1")
+    if not durations or min(durations) < 1 or max(durations) > 24:
+        raise HTTPException(status_code=422, detail="duration values must be between 1 and 24")
+    result = await run_cpu(surplus_grid, guests, request.eventType, request.mealType, durations,
+                           request.pareto, request.top, request.sortBy)
+    # Plain columns of numbers and strings: skip FastAPI's per-element encoder
+    return JSONResponse(result)
+
 @app.get('/food-categories')
 async def get_food_categories():
     """Get available food categories and their items"""
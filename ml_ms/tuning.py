@@ -0,0 +1,168 @@
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterSampler
+from xgboost import XGBRegressor
+
+BASE_PARAMS = {"objective": "reg:squarederror", "random_state": 42, "eval_metric": "rmse"}
+
+
+def split_cores(n_tasks, n_jobs=None):
+    """
+    Split cores between parallel fits and XGBoost threads per fit, so search
+    workers and booster threads don't oversubscribe the machine.
+    """
+    total = n_jobs if n_jobs and n_jobs > 0 else (os.cpu_count() or 1)
+    workers = max(1, min(n_tasks, total))
+    return workers, max(1, total // workers)
+
+
+def data_fingerprint(X, y):
+    h = hashlib.sha256()
+    h.update(",".join(map(str, X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class FoldCache:
+    """Fold scores on disk keyed by data fingerprint + params + fold layout"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(fingerprint, params, fold, n_folds, n_samples, early_stopping_rounds):
+        spec = {"data": fingerprint, "params": params, "fold": fold, "n_folds": n_folds,
+                "n_samples": n_samples, "early_stopping_rounds": early_stopping_rounds}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, result):
+        self.entries[key] = result
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def _fit_fold(params, X, y, train_idx, val_idx, threads, early_stopping_rounds):
+    start = time.perf_counter()
+    X_train, y_train = X.iloc[train_idx], y.iloc[train_idx]
+    X_val, y_val = X.iloc[val_idx], y.iloc[val_idx]
+    model = XGBRegressor(**BASE_PARAMS, **params, n_jobs=threads,
+                         early_stopping_rounds=early_stopping_rounds)
+    fit_kwargs = {"eval_set": [(X_val, y_val)], "verbose": False} if early_stopping_rounds else {}
+    model.fit(X_train, y_train, **fit_kwargs)
+    return {
+        "score": float(r2_score(y_val, model.predict(X_val))),
+        "seconds": time.perf_counter() - start,
+        "best_iteration": getattr(model, "best_iteration", None) if early_stopping_rounds else None,
+    }
+
+
+def evaluate_candidates(candidates, X, y, fingerprint, cache, n_folds=3, n_jobs=None,
+                        early_stopping_rounds=None):
+    """Mean CV r2 and summed fit time per candidate; folds already in `cache` are not refit"""
+    folds = list(KFold(n_splits=n_folds).split(X))
+    results, tasks = {}, []
+    for c, params in enumerate(candidates):
+        for f in range(n_folds):
+            key = FoldCache.key(fingerprint, params, f, n_folds, len(X), early_stopping_rounds)
+            cached = cache.get(key)
+            if cached is None:
+                tasks.append((c, f, key))
+            else:
+                results[c, f] = {**cached, "cached": True}
+
+    if tasks:
+        workers, threads = split_cores(len(tasks), n_jobs)
+        fitted = Parallel(n_jobs=workers)(
+            delayed(_fit_fold)(candidates[c], X, y, *folds[f], threads, early_stopping_rounds)
+            for c, f, _ in tasks)
+        for (c, f, key), result in zip(tasks, fitted):
+            cache.put(key, result)
+            results[c, f] = {**result, "cached": False}
+        cache.save()
+
+    report = []
+    for c, params in enumerate(candidates):
+        fold_results = [results[c, f] for f in range(n_folds)]
+        report.append({
+            "params": params,
+            "score": float(np.mean([r["score"] for r in fold_results])),
+            "seconds": sum(r["seconds"] for r in fold_results),
+            "cached_folds": sum(r["cached"] for r in fold_results),
+            "n_samples": len(X),
+        })
+    return report
+
+
+def search_params(X, y, param_dist, n_iter=10, n_folds=3, strategy="random", eta=3,
+                  cache_path=None, n_jobs=None, early_stopping_rounds=None, random_state=42):
+    """
+    Hyperparameter search over `param_dist` sampled like RandomizedSearchCV.
+
+    strategy="random" scores every candidate on all rows. strategy="halving"
+    runs successive halving: all candidates start on a subsample, and only the
+    best 1/eta of each round move on to eta times more rows.
+
+    Returns (best_params, report) where report lists every evaluation.
+    """
+    candidates = list(ParameterSampler(param_dist, n_iter=n_iter, random_state=random_state))
+    cache = FoldCache(cache_path)
+    fingerprint = data_fingerprint(X, y)
+
+    if strategy == "random":
+        rounds = [len(X)]
+    elif strategy == "halving":
+        n_rounds = max(1, math.ceil(math.log(len(candidates), eta)))
+        min_samples = n_folds * 20
+        rounds = [max(min_samples, len(X) // eta ** (n_rounds - 1 - r)) for r in range(n_rounds)]
+    else:
+        raise ValueError(f"Unknown search strategy: {strategy}")
+
+    order = np.random.RandomState(random_state).permutation(len(X))
+    survivors = list(range(len(candidates)))
+    full_report = []
+    for r, n_samples in enumerate(rounds):
+        idx = order[:n_samples] if n_samples < len(X) else np.arange(len(X))
+        report = evaluate_candidates([candidates[i] for i in survivors], X.iloc[idx], y.iloc[idx],
+                                     f"{fingerprint}:{n_samples}", cache, n_folds, n_jobs,
+                                     early_stopping_rounds)
+        for entry in report:
+            entry["round"] = r
+        full_report.extend(report)
+
+        ranked = sorted(range(len(survivors)), key=lambda i: report[i]["score"], reverse=True)
+        if r < len(rounds) - 1:
+            survivors = [survivors[i] for i in ranked[:math.ceil(len(survivors) / eta)]]
+        else:
+            best_params = candidates[survivors[ranked[0]]]
+
+    return best_params, full_report
+
+
+def print_report(report):
+    for entry in report:
+        cached = f" ({entry['cached_folds']} cached)" if entry["cached_folds"] else ""
+        print(f"  round {entry['round']} n={entry['n_samples']:>6}  r2={entry['score']:.4f}  "
+              f"{entry['seconds']:6.2f}s{cached}  {entry['params']}")
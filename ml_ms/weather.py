@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+BASE_URL = "https://api.weatherapi.com/v1/current.json"
+FORECAST_URL = "https://api.weatherapi.com/v1/forecast.json"
+
+
+class WeatherUnavailable(Exception):
+    """Raised when no fresh or stale reading exists and the upstream fetch failed"""
+
+
+class WeatherAPIBackend:
+    """weatherapi.com backend sharing one pooled async HTTP client"""
+
+    def __init__(self, api_key, base_url=BASE_URL, timeout=5.0, max_connections=10):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def fetch(self, city):
+        response = await self._http().get(self.base_url, params={"key": self.api_key, "q": city})
+        response.raise_for_status()
+        data = response.json()
+        return {"temperature_C": float(data["current"]["temp_c"]),
+                "humidity_percent": float(data["current"]["humidity"])}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class WeatherAPIForecastBackend(WeatherAPIBackend):
+    """Daily forecast for the next `days` days: {iso date: reading} from each day's averages"""
+
+    def __init__(self, api_key, days=7, **kwargs):
+        super().__init__(api_key, base_url=FORECAST_URL, **kwargs)
+        self.days = days
+
+    async def fetch(self, city):
+        response = await self._http().get(self.base_url, params={"key": self.api_key, "q": city, "days": self.days})
+        response.raise_for_status()
+        return {day["date"]: {"temperature_C": float(day["day"]["avgtemp_c"]),
+                              "humidity_percent": float(day["day"]["avghumidity"])}
+                for day in response.json()["forecast"]["forecastday"]}
+
+
+class StubWeatherBackend:
+    """Offline backend: fixed readings per city, `default` for everything else"""
+
+    def __init__(self, readings=None, default=(27.0, 77.0)):
+        self.readings = {k.strip().lower(): v for k, v in (readings or {}).items()}
+        self.default = default
+        self.calls = 0
+
+    async def fetch(self, city):
+        self.calls += 1
+        temp, humidity = self.readings.get(city.strip().lower(), self.default)
+        return {"temperature_C": float(temp), "humidity_percent": float(humidity)}
+
+    async def aclose(self):
+        pass
+
+
+class StubForecastBackend(StubWeatherBackend):
+    """Offline forecast: the city's fixed reading for each of the next `days` days"""
+
+    def __init__(self, readings=None, default=(27.0, 77.0), days=7, today=date.today):
+        super().__init__(readings, default)
+        self.days = days
+        self.today = today
+
+    async def fetch(self, city):
+        reading = await super().fetch(city)
+        start = self.today()
+        return {(start + timedelta(days=i)).isoformat(): reading for i in range(self.days)}
+
+
+def reading_for(forecast, day):
+    """
+    (reading, borrowed) for `day` (ISO string). Days outside the forecast get the
+    nearest forecast day's reading, with borrowed=True.
+    """
+    reading = forecast.get(day)
+    if reading is not None:
+        return reading, False
+    days = sorted(forecast)
+    return forecast[days[0] if day < days[0] else days[-1]], True
+
+
+class WeatherProvider:
+    """
+    Per-city weather cache in front of a backend.
+
+    Readings younger than `ttl` seconds are served from memory. Older readings
+    are still served for up to `max_stale` more seconds while a background
+    refresh runs (stale-while-revalidate). Concurrent lookups for the same city
+    share a single upstream fetch, and the cache keeps at most `max_size`
+    cities, evicting the least recently used one.
+    """
+
+    def __init__(self, backend, ttl=600, max_stale=3 * 3600, max_size=256, clock=time.monotonic):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_size = max_size
+        self._clock = clock
+        self._cache = OrderedDict()   # key -> (fetched_at, reading)
+        self._inflight = {}           # key -> asyncio.Task
+        self._background = set()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "errors": 0}
+
+    async def get(self, city):
+        key = city.strip().lower()
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            age = self._clock() - entry[0]
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return entry[1]
+            if age < self.ttl + self.max_stale:
+                self.stats["stale"] += 1
+                self._refresh_in_background(key, city)
+                return entry[1]
+
+        self.stats["misses"] += 1
+        try:
+            return await asyncio.shield(self._fetch(key, city))
+        except Exception as e:
+            raise WeatherUnavailable(f"No weather available for {city!r}: {e}") from e
+
+    async def get_many(self, cities):
+        """Look up several cities concurrently; failures are returned as exceptions"""
+        cities = list(dict.fromkeys(cities))
+        readings = await asyncio.gather(*(self.get(c) for c in cities), return_exceptions=True)
+        return dict(zip(cities, readings))
+
+    def _fetch(self, key, city):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, city))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(self, key, city):
+        try:
+            reading = await self.backend.fetch(city)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self._cache[key] = (self._clock(), reading)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return reading
+
+    def _refresh_in_background(self, key, city):
+        if key in self._inflight:
+            return
+        task = self._fetch(key, city)
+        self._background.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()   # a failed refresh keeps the stale entry
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self.backend.aclose()
+
+
+def provider_from_env():
+    """Build the provider configured by WEATHER_* environment variables"""
+    if os.environ.get("WEATHER_BACKEND", "weatherapi").lower() == "stub":
+        backend = StubWeatherBackend()
+    else:
+        backend = WeatherAPIBackend(
+            api_key=os.environ.get("WEATHER_API_KEY", "a7e721a9c38d4d8aad6112350252208"),
+            timeout=float(os.environ.get("WEATHER_TIMEOUT_SECONDS", 5.0)),
+        )
+    return WeatherProvider(
+        backend,
+        ttl=float(os.environ.get("WEATHER_TTL_SECONDS", 600)),
+        max_stale=float(os.environ.get("WEATHER_MAX_STALE_SECONDS", 3 * 3600)),
+        max_size=int(os.environ.get("WEATHER_CACHE_SIZE", 256)),
+    )
+
+
+def forecast_provider_from_env():
+    """Cached daily forecasts (same backend choice as provider_from_env), refreshed every few hours"""
+    days = int(os.environ.get("WEATHER_FORECAST_DAYS", 7))
+    if os.environ.get("WEATHER_BACKEND", "weatherapi").lower() == "stub":
+        backend = StubForecastBackend(days=days)
+    else:
+        backend = WeatherAPIForecastBackend(
+            api_key=os.environ.get("WEATHER_API_KEY", "a7e721a9c38d4d8aad6112350252208"),
+            days=days,
+            timeout=float(os.environ.get("WEATHER_TIMEOUT_SECONDS", 5.0)),
+        )
+    return WeatherProvider(
+        backend,
+        ttl=float(os.environ.get("WEATHER_FORECAST_TTL_SECONDS", 3 * 3600)),
+        max_stale=float(os.environ.get("WEATHER_MAX_STALE_SECONDS", 3 * 3600)),
+        max_size=int(os.environ.get("WEATHER_CACHE_SIZE", 256)),
+    )
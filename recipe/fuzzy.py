@@ -0,0 +1,132 @@
+from collections import Counter
+
+from normalize import clean
+
+MAX_SUGGESTIONS = 10
+
+
+def max_edits(token):
+    """Typos tolerated for a token of this length"""
+    return 0 if len(token) < 3 else 1 if len(token) < 6 else 2
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_distance(a, b, limit):
+    """
+    Edit distance of a and b counting adjacent swaps as one edit ("onoin" ->
+    "onion"), or limit + 1 as soon as it must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only cells within `limit` of the diagonal can stay within the limit
+    over = limit + 1
+    before, previous = None, [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [i if i <= limit else over] + [over] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            cost = previous[j - 1] + (ca != cb)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost if cost < over else over
+        if min(current) > limit:
+            return over
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []      # best completions below this node, most popular first
+
+
+class VocabularyMatcher:
+    """
+    Prefix and typo-tolerant lookup over the ingredient vocabulary, built once
+    when the index is loaded. The trie indexes every word start of every name
+    (and alias), so "dal" completes "urad dal"; each node keeps its
+    MAX_SUGGESTIONS most popular names, so a lookup is O(len(prefix)).
+    Fuzzy matching only measures edit distance on names that share enough
+    character trigrams with the query to be within the allowed edits.
+    """
+
+    def __init__(self, vocab, aliases, popularity):
+        self.vocab = vocab
+        self.popularity = popularity
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.root = TrieNode()
+
+        # Surface form -> term id, for canonical names and their aliases alike
+        self.forms = dict(self.term_ids)
+        for alias, name in aliases.items():
+            if name in self.term_ids:
+                self.forms.setdefault(alias, self.term_ids[name])
+
+        ranked = sorted(self.forms.items(), key=lambda item: (-popularity[item[1]], item[0]))
+        for form, term_id in ranked:
+            words = form.split()
+            for start in range(len(words)):
+                self._insert(" ".join(words[start:]), term_id)
+
+        self.grams = {}
+        for form, term_id in self.forms.items():
+            for gram in trigrams(form):
+                self.grams.setdefault(gram, []).append(form)
+
+    def _insert(self, key, term_id):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, TrieNode())
+            if term_id not in node.top and len(node.top) < MAX_SUGGESTIONS:
+                node.top.append(term_id)
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        """Term ids whose name (or any word in it) starts with prefix, most popular first"""
+        node = self.root
+        for ch in clean(prefix):
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+    def correct(self, token, limit=None):
+        """Term ids within the allowed edit distance of token, closest (then most popular) first"""
+        token = clean(token)
+        if token in self.forms:
+            return [self.forms[token]]
+        k = max_edits(token) if limit is None else limit
+        if k == 0:
+            return []
+
+        query = trigrams(token)
+        shared = Counter(form for gram in query for form in self.grams.get(gram, ()))
+        # q-gram lemma: an edit destroys at most 3 trigrams (4 for an adjacent swap)
+        needed = max(1, len(query) - 4 * k)
+        best = {}
+        for form, count in shared.items():
+            if count < needed or abs(len(form) - len(token)) > k:
+                continue
+            distance = bounded_distance(token, form, k)
+            if distance <= k:
+                term_id = self.forms[form]
+                best[term_id] = min(distance, best.get(term_id, distance))
+        return sorted(best, key=lambda t: (best[t], -self.popularity[t], self.vocab[t]))
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """Autocomplete: prefix completions, topped up with typo corrections"""
+        found = self.complete(prefix, limit)
+        if len(found) < limit:
+            found += [t for t in self.correct(prefix) if t not in found]
+        return found[:limit]
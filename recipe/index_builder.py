@@ -0,0 +1,125 @@
+import numpy as np
+
+from normalize import add_plurals, canonical, clean
+from recipe_index import RecipeIndex, build_arrays, build_facets, write_index
+
+
+class IndexBuilder:
+    """
+    Recipe index in editable form: metadata plus ingredient term ids per recipe,
+    keyed by recipe name. Recipes are added in one pass (no per-ingredient
+    scans), and editing an existing index never re-reads the source CSV.
+
+    upsert/delete only touch the edited recipe in memory, but save() rewrites
+    the whole file: it re-sorts every posting, rebuilds the facets and
+    re-serializes the metadata header, so each save is O(catalogue) (about
+    1.5 s at 100k recipes). Batch edits into one save; there is no append-only
+    delta segment.
+    """
+
+    def __init__(self, aliases=None, generation=0, vocab=()):
+        self.recipes = []        # metadata dict, or None once deleted
+        self.ingredients = []    # term ids per recipe (ids into self.vocab)
+        self.positions = {}      # recipe name -> slot
+        self.vocab = list(vocab)
+        self.term_ids = {name: t for t, name in enumerate(self.vocab)}
+        self.aliases = dict(aliases or {})
+        self.generation = generation
+        self._new_names = set()
+
+    def __len__(self):
+        return len(self.positions)
+
+    @classmethod
+    def from_index(cls, index):
+        """Editable copy of a loaded RecipeIndex"""
+        builder = cls(index.aliases, index.meta.get("generation", 0), index.vocab)
+        if "recipe_terms" in index.arrays:
+            offsets = index.arrays["recipe_offsets"].tolist()
+            terms = index.arrays["recipe_terms"].tolist()
+        else:
+            # Format 1 files only have postings: invert them with one sort
+            term_of = np.repeat(np.arange(len(index.vocab)), np.diff(index.term_offsets))
+            order = np.argsort(index.postings, kind="stable")
+            offsets = np.searchsorted(index.postings[order], np.arange(index.n_recipes + 1)).tolist()
+            terms = term_of[order].tolist()
+        for i, recipe in enumerate(index.recipes):
+            builder._place(dict(recipe), terms[offsets[i]:offsets[i + 1]])
+        return builder
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_index(RecipeIndex(path))
+
+    def _place(self, recipe, term_ids):
+        slot = self.positions.get(recipe["name"])
+        if slot is None:
+            self.positions[recipe["name"]] = len(self.recipes)
+            self.recipes.append(recipe)
+            self.ingredients.append(term_ids)
+        else:
+            self.recipes[slot] = recipe
+            self.ingredients[slot] = term_ids
+        return slot is None
+
+    def _term_id(self, raw):
+        key = clean(raw)
+        if not key:
+            return None
+        # Each distinct spelling goes through inflect once; the alias map is the memo
+        name = self.aliases.get(key)
+        if name is None:
+            name = self.aliases[key] = canonical(key)
+            self._new_names.add(name)
+        term_id = self.term_ids.get(name)
+        if term_id is None:
+            term_id = self.term_ids[name] = len(self.vocab)
+            self.vocab.append(name)
+        return term_id
+
+    def upsert(self, recipe, ingredients):
+        """
+        Add a recipe, or replace the one with the same name in place (keeping its
+        position). `ingredients` are raw names; returns True if the recipe is new.
+        """
+        term_ids = {self._term_id(raw) for raw in ingredients}
+        term_ids.discard(None)
+        return self._place(dict(recipe), list(term_ids))
+
+    def delete(self, name):
+        slot = self.positions.pop(name, None)
+        if slot is None:
+            return False
+        self.recipes[slot] = self.ingredients[slot] = None
+        return True
+
+    def build(self):
+        """(recipes, vocab, arrays) for the live recipes in insertion order, vocab sorted"""
+        live = [i for i, recipe in enumerate(self.recipes) if recipe is not None]
+        recipes = [self.recipes[i] for i in live]
+        sizes = np.fromiter((len(self.ingredients[i]) for i in live), dtype=np.int64, count=len(live))
+        terms = np.fromiter((t for i in live for t in self.ingredients[i]), dtype=np.int64,
+                            count=int(sizes.sum()))
+
+        # Drop names no live recipe uses and number the rest alphabetically
+        used = np.flatnonzero(np.bincount(terms, minlength=len(self.vocab)))
+        used = used[np.argsort([self.vocab[t] for t in used], kind="stable")]
+        renumber = np.zeros(len(self.vocab), dtype=np.int64)
+        renumber[used] = np.arange(len(used))
+        terms = renumber[terms]
+
+        # Forward lists sorted by term within each recipe
+        owners = np.repeat(np.arange(len(live)), sizes)
+        terms = terms[np.lexsort((terms, owners))]
+        return recipes, [self.vocab[t] for t in used], build_arrays(terms, sizes, len(used))
+
+    def save(self, path):
+        """Write the full index (every live recipe); cost grows with the catalogue, not the edit"""
+        recipes, vocab, arrays = self.build()
+        facets, facet_arrays = build_facets(recipes)
+        add_plurals(self.aliases, self._new_names)
+        self._new_names.clear()
+        self.generation += 1
+        write_index(path, recipes, vocab, {**arrays, **facet_arrays}, self.aliases,
+                    meta={"generation": self.generation, "facets": facets})
+        return len(recipes), len(vocab)
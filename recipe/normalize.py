@@ -0,0 +1,89 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def inflector():
+    """Inflect engine for singular/plural normalization, imported on first use (the import takes seconds)"""
+    import inflect
+    return inflect.engine()
+
+
+# Spelling variants, replaced word by word ("green chilly" -> "green chilli")
+WORD_VARIANTS = {
+    "chilly": "chilli",
+    "chili": "chilli",
+    "daal": "dal",
+    "yoghurt": "yogurt",
+}
+
+# Whole ingredients that name the same thing
+SYNONYMS = {
+    "besan flour": "besan",
+    "gram flour": "besan",
+    "bengal gram flour": "besan",
+    "chickpea flour": "besan",
+    "dahi": "curd",
+    "gur": "jaggery",
+    "sooji": "semolina",
+    "suji": "semolina",
+    "rava": "semolina",
+    "bombay rava": "semolina",
+    "maida": "all purpose flour",
+    "maida flour": "all purpose flour",
+    "plain flour": "all purpose flour",
+    "refined flour": "all purpose flour",
+    "cilantro": "coriander",
+    "eggplant": "brinjal",
+    "cottage cheese": "paneer",
+    "arhar dal": "toor dal",
+    "mung bean": "moong bean",
+    "methi leaf": "fenugreek leaf",
+    "atta": "whole wheat flour",
+}
+
+
+def clean(token):
+    """Lowercase and collapse whitespace"""
+    return " ".join(token.lower().split())
+
+
+@lru_cache(maxsize=4096)
+def canonical(token):
+    """Canonical ingredient name: cleaned, singularized, variants and synonyms merged"""
+    word = clean(token)
+    if not word:
+        return word
+    singular = inflector().singular_noun(word)
+    word = singular if singular else word
+    word = " ".join(WORD_VARIANTS.get(w, w) for w in word.split())
+    return SYNONYMS.get(word, word)
+
+
+def add_plurals(aliases, names):
+    """Map each canonical name and its plural to itself, keeping spellings already mapped"""
+    for name in names:
+        aliases.setdefault(inflector().plural_noun(name), name)
+        aliases.setdefault(name, name)
+    return aliases
+
+
+def build_aliases(raw_tokens):
+    """
+    Precomputed surface form -> canonical map for the index: every spelling seen
+    in the data plus the plural of each canonical name, so most query tokens are
+    a dict lookup instead of an inflect call.
+    """
+    aliases = {clean(t): canonical(t) for t in raw_tokens if clean(t)}
+    return add_plurals(aliases, set(aliases.values()))
+
+
+class Normalizer:
+    """Query-side canonicalization backed by the index's precomputed aliases"""
+
+    def __init__(self, aliases):
+        self.aliases = aliases
+
+    def __call__(self, token):
+        key = clean(token)
+        name = self.aliases.get(key)
+        return name if name is not None else canonical(key)
@@ -0,0 +1,217 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"RIDX"
+# Metadata fields with a bitmap per value, for filtering and facet counts
+FACET_FIELDS = ("diet", "course", "region")
+FORMAT_VERSION = 2
+ALIGN = 64
+
+# Format 2 adds the forward recipe -> ingredient lists used by IndexBuilder.
+# File layout: MAGIC | u32 format version | u64 header length | JSON header |
+# padding | arrays, each starting on an ALIGN boundary. The header holds the
+# recipe table (metadata stored once), the ingredient vocabulary, the
+# surface form -> canonical ingredient aliases and the dtype/offset/shape of
+# every array, so arrays can be memory-mapped in place.
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def write_index(path, recipes, vocab, arrays, aliases=None, meta=None):
+    """Write the index atomically (tmp file + rename) so readers never see a partial file"""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    layout, offset = {}, 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += a.nbytes + _pad(a.nbytes)
+
+    header = json.dumps({"format_version": FORMAT_VERSION, "meta": meta or {}, "recipes": recipes,
+                         "vocab": vocab, "aliases": aliases or {}, "arrays": layout},
+                        ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    prefix = MAGIC + struct.pack("<IQ", FORMAT_VERSION, len(header)) + header
+    prefix += b"\0" * _pad(len(prefix))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        for a in arrays.values():
+            f.write(a.tobytes())
+            f.write(b"\0" * _pad(a.nbytes))
+    os.replace(tmp_path, path)
+
+
+def build_arrays(terms, sizes, n_terms):
+    """
+    Index arrays from the forward lists: `terms` holds every recipe's term ids
+    back to back, `sizes` how many belong to each recipe. Postings (term ->
+    recipe ids) are the recipe x ingredient 0/1 matrix in CSC form, made with
+    one stable sort; the forward lists are kept for incremental edits, and idf
+    plus per-recipe sizes/weights are precomputed for ranking.
+    """
+    n_recipes = len(sizes)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    terms = np.asarray(terms, dtype=np.int32)
+    recipe_offsets = np.zeros(n_recipes + 1, dtype=np.int64)
+    np.cumsum(sizes, out=recipe_offsets[1:])
+    owners = np.repeat(np.arange(n_recipes, dtype=np.int32), sizes)
+
+    # Stable sort by term keeps each posting list in recipe order
+    order = np.argsort(terms, kind="stable")
+    lengths = np.bincount(terms, minlength=n_terms)
+    term_offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(lengths, out=term_offsets[1:])
+
+    # Smoothed idf (as in sklearn's TfidfTransformer): rare ingredients weigh more
+    idf = np.log((1 + n_recipes) / (1 + lengths)) + 1
+    return {
+        "term_offsets": term_offsets,
+        "postings": owners[order],
+        "recipe_offsets": recipe_offsets,
+        "recipe_terms": terms,
+        "idf": idf,
+        "recipe_sizes": sizes.astype(np.int32),
+        "recipe_weights": np.bincount(owners, weights=idf[terms], minlength=n_recipes),
+    }
+
+
+def facet_value(value):
+    """Facet key for a metadata value; missing and -1 placeholders become 'unknown'"""
+    if value is None or str(value).strip() in ("", "-1"):
+        return "unknown"
+    return str(value).strip().lower()
+
+
+def total_time(recipe):
+    """Prep + cook minutes, or -1 when either is unknown"""
+    prep, cook = recipe.get("prep_time"), recipe.get("cook_time")
+    if prep is None or cook is None or prep < 0 or cook < 0:
+        return -1
+    return prep + cook
+
+
+def build_facets(recipes):
+    """
+    Facet values (header) and arrays: one packed bitmap row per value of each
+    FACET_FIELDS field, per-recipe total time, and recipe ids sorted by time
+    (unknown times left out) so a max-time filter is one binary search.
+    """
+    values, arrays = {}, {}
+    for field in FACET_FIELDS:
+        keys = [facet_value(r.get(field)) for r in recipes]
+        values[field] = sorted(set(keys))
+        codes = {v: i for i, v in enumerate(values[field])}
+        bits = np.zeros((len(values[field]), len(recipes)), dtype=bool)
+        bits[[codes[k] for k in keys], np.arange(len(recipes))] = True
+        arrays[f"facet_{field}"] = np.packbits(bits, axis=1, bitorder="little")
+
+    times = np.fromiter((total_time(r) for r in recipes), dtype=np.int32, count=len(recipes))
+    known = np.flatnonzero(times >= 0)
+    order = known[np.argsort(times[known], kind="stable")].astype(np.int32)
+    arrays.update({"total_time": times, "time_order": order, "time_sorted": times[order]})
+    return values, arrays
+
+
+def top_k(scores, candidates, limit=None):
+    """Candidate ids ordered by descending score (ties in dataset order), at most `limit`"""
+    values = scores[candidates]
+    if limit is not None and limit < len(candidates):
+        # Keep everything tied with the k-th score so the cut is deterministic
+        kth = -np.partition(-values, limit - 1)[limit - 1]
+        keep = values >= kth
+        candidates, values = candidates[keep], values[keep]
+    return candidates[np.lexsort((candidates, -values))][:limit]
+
+
+class RecipeIndex:
+    """Read-only view of an index file; arrays are memory-mapped, not copied"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(16)
+            if prefix[:4] != MAGIC:
+                raise ValueError(f"Not a recipe index: {path}")
+            version, header_len = struct.unpack("<IQ", prefix[4:])
+            if version > FORMAT_VERSION:
+                raise ValueError(f"Index format {version} is newer than supported ({FORMAT_VERSION})")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        data_start = 16 + header_len + _pad(16 + header_len)
+        self.format_version = header["format_version"]
+        self.meta = header["meta"]
+        self.recipes = header["recipes"]
+        self.vocab = header["vocab"]
+        self.term_ids = {term: i for i, term in enumerate(self.vocab)}
+        self.aliases = header.get("aliases", {})
+        self.arrays = {}
+        for name, spec in header["arrays"].items():
+            shape = tuple(spec["shape"])
+            if int(np.prod(shape)) == 0:
+                self.arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+            else:
+                self.arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r",
+                                              offset=data_start + spec["offset"], shape=shape)
+        self.term_offsets = self.arrays["term_offsets"]
+        self.postings = self.arrays["postings"]
+        self.idf = self.arrays["idf"]
+        self.recipe_sizes = self.arrays["recipe_sizes"]
+        self.recipe_weights = self.arrays["recipe_weights"]
+
+        # Facet bitmaps unpacked once: one bool row per value
+        self.facets = {}
+        for field, values in self.meta.get("facets", {}).items():
+            bits = np.unpackbits(self.arrays[f"facet_{field}"], axis=1, count=self.n_recipes,
+                                 bitorder="little").astype(bool)
+            self.facets[field] = (values, bits)
+
+    @property
+    def n_recipes(self):
+        return len(self.recipes)
+
+    def facet_mask(self, field, wanted):
+        """Recipes whose `field` is any of the wanted values"""
+        values, bits = self.facets[field]
+        rows = [i for i, v in enumerate(values) if v in {facet_value(w) for w in wanted}]
+        return bits[rows].any(axis=0)
+
+    def time_mask(self, max_minutes):
+        """Recipes with a known total time of at most max_minutes"""
+        mask = np.zeros(self.n_recipes, dtype=bool)
+        end = np.searchsorted(self.arrays["time_sorted"], max_minutes, side="right")
+        mask[self.arrays["time_order"][:end]] = True
+        return mask
+
+    def facet_counts(self, field, base):
+        """{value: number of recipes in `base` with that value}, non-zero values only"""
+        values, bits = self.facets[field]
+        counts = np.count_nonzero(bits & base, axis=1)
+        return {v: int(c) for v, c in zip(values, counts) if c}
+
+    def posting(self, term_id):
+        return self.postings[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]
+
+    def _hits(self, term_ids):
+        if not term_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        hits = np.concatenate([self.posting(t) for t in term_ids])
+        weights = np.repeat(self.idf[term_ids], [len(self.posting(t)) for t in term_ids])
+        return hits, weights
+
+    def score(self, term_ids, missing_penalty=0.0):
+        """
+        Score every recipe against a query in one sparse matrix-vector product.
+        Returns (matched, score): matched is the count of query ingredients in
+        each recipe; score is the idf-weighted share of the recipe's ingredients
+        covered by the query, minus `missing_penalty` per ingredient still missing.
+        """
+        hits, weights = self._hits(term_ids)
+        matched = np.bincount(hits, minlength=self.n_recipes)
+        covered = np.bincount(hits, weights=weights, minlength=self.n_recipes)
+        score = covered / np.maximum(self.recipe_weights, 1e-12)
+        score -= missing_penalty * (self.recipe_sizes - matched)
+        return matched, score
@@ -1,45 +1,225 @@
-from fastapi import FastAPI, Query
+import hashlib
 import json
-import inflect
-
-app = FastAPI(title="Recipe Search API")
-
-# Inflect engine for singular/plural normalization
-p = inflect.engine()
-
-def normalize_word(word):
-    """Lowercase + singularize"""
-    word = word.lower().strip()
-    singular = p.singular_noun(word)
-    return singular if singular else word
-
-# Load inverted index
-with open("inverted_index.json", "r", encoding="utf-8") as f:
-    inverted_index = json.load(f)
-
-def search_recipes(leftovers: str):
-    ingredients = [normalize_word(ing) for ing in leftovers.split(",")]
-    recipe_scores = {}
-
-    for ing in ingredients:
-        if ing in inverted_index:
-            for recipe in inverted_index[ing]:   # recipe is a dict
-                recipe_name = recipe["name"]     # use name as key
-                if recipe_name not in recipe_scores:
-                    # Store recipe dict + score
-                    recipe_scores[recipe_name] = {**recipe, "score": 1}
-                else:
-                    # Just increment score
-                    recipe_scores[recipe_name]["score"] += 1
-
-    # Rank by score, descending
-    ranked = sorted(recipe_scores.values(), key=lambda x: x["score"], reverse=True)
-    return ranked
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+
+import numpy as np
+from fastapi import FastAPI, Query, Request, Response
+from smartserve_common.metrics import Stages, instrument, registry as metrics
+from smartserve_common.warmup import Warmup, add_health
+
+from fuzzy import MAX_SUGGESTIONS, VocabularyMatcher
+from normalize import Normalizer, inflector
+from recipe_index import RecipeIndex, top_k
+from search_cache import SearchCache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warmup.start()
+    yield
+    warmup.stop()
+
+
+app = FastAPI(title="Recipe Search API", lifespan=lifespan)
+instrument(app, "recipes")
+stages = Stages("recipes")
+
+# Compact recipe index (built by recipeclean.py)
+INDEX_PATH = os.environ.get("RECIPE_INDEX_PATH", os.path.join(BASE_DIR, "recipe_index.bin"))
+# How often (seconds) to check whether the index file was rebuilt
+INDEX_CHECK_INTERVAL = float(os.environ.get("RECIPE_INDEX_CHECK_INTERVAL", "2"))
+# Browser/proxy caching of search responses
+CACHE_MAX_AGE = int(os.environ.get("RECIPE_CACHE_MAX_AGE", "300"))
+
+# Weighted ranking: penalty per recipe ingredient the user doesn't have
+MISSING_PENALTY = 0.01
+DEFAULT_LIMIT = 20
+
+def index_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+class SearchEngine:
+    """One loaded index with everything derived from it, swapped as a whole on rebuild"""
+
+    def __init__(self, path):
+        self.stamp = index_stamp(path)
+        self.index = RecipeIndex(path)
+        # Same canonical names as the index build (synonyms, spelling variants, plurals)
+        self.normalize = Normalizer(self.index.aliases)
+        # Recipes per ingredient, used to rank autocomplete suggestions
+        self.popularity = np.diff(self.index.term_offsets)
+        self.matcher = VocabularyMatcher(self.index.vocab, self.index.aliases, self.popularity)
+
+    def resolve_terms(self, leftovers: str, fuzzy=False):
+        """Index term ids for the query, plus {input: ingredient} typo corrections when fuzzy"""
+        index = self.index
+        term_ids, corrections = {}, {}
+        for raw in leftovers.split(","):
+            name = self.normalize(raw)
+            if name in index.term_ids:
+                term_ids[index.term_ids[name]] = None
+            elif fuzzy and name:
+                matches = self.matcher.correct(name) or self.matcher.correct(raw)
+                if matches:
+                    term_ids[matches[0]] = None
+                    corrections[raw.strip()] = index.vocab[matches[0]]
+        return list(term_ids), corrections
+
+    def filter_masks(self, filters):
+        """One bool mask per active filter; filters maps facet field -> wanted values, plus max_time"""
+        masks = {}
+        for field, wanted in filters.items():
+            if field == "max_time":
+                masks[field] = self.index.time_mask(wanted)
+            elif field in self.index.facets:
+                masks[field] = self.index.facet_mask(field, wanted)
+        return masks
+
+    def rank_recipes(self, term_ids, limit=None, rank="weighted", filters=None):
+        """Ranked results plus facet counts over the recipes sharing an ingredient with the query"""
+        index = self.index
+        matched, weighted = index.score(term_ids, MISSING_PENALTY)
+        scores = matched if rank == "count" else weighted
+
+        # Filters narrow the candidates before top-k; each facet is counted under the other filters
+        masks = self.filter_masks(filters or {})
+        pool = matched > 0
+        facets = {}
+        for field in index.facets:
+            base = pool.copy()
+            for other, mask in masks.items():
+                if other != field:
+                    base &= mask
+            facets[field] = index.facet_counts(field, base)
+        for mask in masks.values():
+            pool &= mask
+
+        # Metadata is built for the top `limit` only
+        results = []
+        for i in top_k(scores, np.flatnonzero(pool), limit):
+            size = int(index.recipe_sizes[i])
+            results.append({**index.recipes[i],
+                            "score": int(scores[i]) if rank == "count" else round(float(scores[i]), 4),
+                            "matched": int(matched[i]),
+                            "missing": size - int(matched[i]),
+                            "coverage": round(int(matched[i]) / size, 4),
+                            "total_time": int(index.arrays["total_time"][i])})
+        return results, facets
+
+# Loaded by the warm-up, or by the first request if that comes sooner
+engine = None
+search_cache = SearchCache(
+    max_entries=int(os.environ.get("RECIPE_CACHE_ENTRIES", "1024")),
+    max_bytes=int(os.environ.get("RECIPE_CACHE_BYTES", str(16 * 1024 * 1024))),
+)
+metrics.add_cache("recipe-search", lambda: (search_cache.stats["hits"], search_cache.stats["misses"]))
+_reload_lock = threading.Lock()
+_last_check = time.monotonic()
+
+def load_engine():
+    global engine
+    with _reload_lock:
+        if engine is None:
+            engine = SearchEngine(INDEX_PATH)
+    return engine
+
+warmup = Warmup("recipes")
+warmup.add("index", load_engine)
+# Query tokens missing from the index aliases fall back to inflect, which takes seconds to import
+warmup.add("inflect", inflector)
+add_health(app, warmup)
+
+def current_engine():
+    """The loaded engine, reloaded (and the result cache dropped) if the index file changed"""
+    global engine, _last_check
+    if engine is None:
+        return load_engine()
+    now = time.monotonic()
+    if now - _last_check < INDEX_CHECK_INTERVAL:
+        return engine
+    with _reload_lock:
+        if now - _last_check >= INDEX_CHECK_INTERVAL:
+            _last_check = now
+            try:
+                if index_stamp(INDEX_PATH) != engine.stamp:
+                    engine = SearchEngine(INDEX_PATH)
+                    search_cache.clear()
+                    print(f"Recipe index reloaded: {len(engine.index.recipes)} recipes")
+            except (OSError, ValueError) as e:
+                print(f"Recipe index reload failed, keeping the loaded one: {e}")
+    return engine
+
+def search_filters(diet=None, course=None, region=None, max_time=None):
+    """Filter spec from query params: comma-separated values match any of them"""
+    filters = {field: sorted({v.strip().lower() for v in value.split(",") if v.strip()})
+               for field, value in (("diet", diet), ("course", course), ("region", region)) if value}
+    if max_time is not None:
+        filters["max_time"] = max_time
+    return filters
 
 @app.get("/search")
-def search(leftovers: str = Query(..., description="Comma-separated ingredients")):
+def search(
+    request: Request,
+    leftovers: str = Query(..., description="Comma-separated ingredients"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=500, description="Maximum number of recipes returned"),
+    rank: Literal["weighted", "count"] = Query("weighted", description="weighted: idf coverage minus missing penalty; count: matched ingredients"),
+    fuzzy: bool = Query(False, description="Correct misspelled ingredients (e.g. tomatos, panner)"),
+    diet: Optional[str] = Query(None, description="e.g. vegetarian or non vegetarian"),
+    course: Optional[str] = Query(None, description="e.g. main course,snack (any of them)"),
+    region: Optional[str] = Query(None, description="e.g. north,south (any of them)"),
+    max_time: Optional[int] = Query(None, ge=0, description="Maximum prep + cook time in minutes"),
+):
+    """
+    Example: /search?leftovers=onion,tomatoes,rice&limit=10&diet=vegetarian&max_time=45
+    """
+    current = current_engine()
+    with stages("resolve"):
+        term_ids, corrections = current.resolve_terms(leftovers, fuzzy)
+    filters = search_filters(diet, course, region, max_time)
+
+    # Same canonical ingredient set + options -> same ranked results, whatever the spelling/order
+    key = (current.stamp, tuple(sorted(term_ids)), limit, rank, json.dumps(filters, sort_keys=True))
+    payload = search_cache.get(key)
+    if payload is None:
+        with stages("rank"):
+            results, facets = current.rank_recipes(term_ids, limit, rank, filters)
+        with stages("serialize"):
+            payload = json.dumps({"results": results, "facets": facets}, ensure_ascii=False,
+                                 separators=(",", ":")).encode("utf-8")[1:-1]
+        search_cache.put(key, payload)
+
+    body = b'{"input":' + json.dumps(leftovers, ensure_ascii=False).encode("utf-8") + b',' + payload
+    if fuzzy:
+        body += b',"corrections":' + json.dumps(corrections, ensure_ascii=False).encode("utf-8")
+    body += b"}"
+
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CACHE_MAX_AGE}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {**search_cache.info(), "index_stamp": list(current_engine().stamp)}
+
+@app.get("/autocomplete")
+def autocomplete(
+    prefix: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(MAX_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+):
     """
-    Example: /search?leftovers=onion,tomatoes,rice
+    Example: /autocomplete?prefix=toma
     """
-    results = search_recipes(leftovers)
-    return {"input": leftovers, "results": results}
+    current = current_engine()
+    with stages("suggest"):
+        suggestions = [{"ingredient": current.index.vocab[t], "recipes": int(current.popularity[t])}
+                       for t in current.matcher.suggest(prefix, limit)]
+    return {"prefix": prefix, "suggestions": suggestions}
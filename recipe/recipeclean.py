@@ -1,62 +1,85 @@
-import pandas as pd
-import inflect
+import argparse
 import json
+import os
+import time
 
-# Initialize inflect engine
-p = inflect.engine()
-
-def normalize_word(word):
-    word = word.lower().strip()
-    singular = p.singular_noun(word)
-    return singular if singular else word
-
-
-# Load your dataset
-df = pd.read_csv("indian_food.csv")
-
-# Fill missing values in ingredients
-df['ingredients'] = df['ingredients'].fillna('')
-
-# Split ingredients into lists
-df['ingredients_list'] = df['ingredients'].str.split(',')
-df['ingredients_list'] = df['ingredients_list'].apply(lambda x: [normalize_word(i.strip()) for i in x])
-
-# Remove duplicates & sort
-df['ingredients_list'] = df['ingredients_list'].apply(lambda x: sorted(set(x)))
-
-# Create full ingredient matrix
-ingredient_matrix = df['ingredients_list'].str.join('|').str.get_dummies()
-
-# Combine with metadata
-final_df = pd.concat([df[['name', 'prep_time', 'cook_time', 'diet', 'region', 'course', 'state', 'diet', 'flavor_profile']], ingredient_matrix], axis=1)
-
-# Save ingredient matrix
-final_df.to_csv("ingredient_matrix.csv", index=False)
-
-
-# 🔹 Build inverted index with metadata
-inverted_index = {}
-
-# Loop through each ingredient
-for ingredient in ingredient_matrix.columns:
-    recipes = df[df['ingredients_list'].apply(lambda x: ingredient in x)]
-
-    # Collect metadata for each recipe
-    recipe_entries = []
-    for _, row in recipes.iterrows():
-        recipe_entries.append({
-            "name": row['name'],
-            "prep_time": row.get('prep_time', None),
-            "cook_time": row.get('cook_time', None),
-            "flavor_profile": row.get('flavor_profile', None),
-            "region": row.get('region', None),
-            "course": row.get('course', None),
-            "state": row.get('state', None),
-        })
-
-    inverted_index[ingredient] = recipe_entries
-
+import numpy as np
+import pandas as pd
 
-# Save inverted index with metadata
-with open("inverted_index.json", "w", encoding="utf-8") as f:
-    json.dump(inverted_index, f, indent=2, ensure_ascii=False)
+from index_builder import IndexBuilder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(BASE_DIR, "indian_food.csv")
+INDEX_PATH = os.path.join(BASE_DIR, "recipe_index.bin")
+
+# Metadata returned with each search result
+RECIPE_FIELDS = ['name', 'prep_time', 'cook_time', 'flavor_profile', 'region', 'course', 'state', 'diet']
+
+
+def read_recipes(csv_path):
+    """(metadata, raw ingredient names) per CSV row, in one pass"""
+    df = pd.read_csv(csv_path)
+    df['ingredients'] = df['ingredients'].fillna('')
+    # to_json turns NaN into null, so the metadata stays valid JSON
+    metadata = json.loads(df[RECIPE_FIELDS].to_json(orient="records", force_ascii=False))
+    return zip(metadata, df['ingredients'].str.split(','))
+
+
+def write_exports(builder, csv_path):
+    """ingredient_matrix.csv and inverted_index.json, derived from the built index"""
+    recipes, vocab, arrays = builder.build()
+    offsets, postings = arrays["term_offsets"], arrays["postings"]
+
+    # Recipe x ingredient 0/1 matrix next to the full CSV metadata
+    dense = np.zeros((len(recipes), len(vocab)), dtype=np.int64)
+    dense[postings, np.repeat(np.arange(len(vocab)), np.diff(offsets))] = 1
+    matrix = pd.DataFrame(dense, columns=vocab)
+    df = pd.read_csv(csv_path).set_index('name').loc[[r['name'] for r in recipes]].reset_index()
+    final_df = pd.concat([df[['name', 'prep_time', 'cook_time', 'diet', 'region', 'course', 'state', 'diet', 'flavor_profile']], matrix], axis=1)
+    final_df.to_csv(os.path.join(BASE_DIR, "ingredient_matrix.csv"), index=False)
+
+    # 🔹 Inverted index with metadata, straight from the posting lists
+    inverted_index = {term: [recipes[i] for i in postings[offsets[t]:offsets[t + 1]]]
+                      for t, term in enumerate(vocab)}
+    with open(os.path.join(BASE_DIR, "inverted_index.json"), "w", encoding="utf-8") as f:
+        json.dump(inverted_index, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or edit the recipe search index")
+    parser.add_argument("--csv", default=DATASET_PATH, help="Recipes for a full build")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--upsert", metavar="CSV", help="Add/replace these recipes in the existing index "
+                        "(the index is rewritten once, so pass many recipes per call)")
+    parser.add_argument("--delete", nargs="+", metavar="NAME", help="Remove recipes from the existing index")
+    parser.add_argument("--no-exports", action="store_true",
+                        help="Skip ingredient_matrix.csv / inverted_index.json on a full build")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.upsert or args.delete:
+        builder = IndexBuilder.load(args.index)
+        added = updated = deleted = 0
+        if args.upsert:
+            for recipe, ingredients in read_recipes(args.upsert):
+                if builder.upsert(recipe, ingredients):
+                    added += 1
+                else:
+                    updated += 1
+        for name in args.delete or ():
+            deleted += builder.delete(name)
+        print(f"Index edit: {added} added, {updated} updated, {deleted} deleted")
+    else:
+        builder = IndexBuilder()
+        for recipe, ingredients in read_recipes(args.csv):
+            builder.upsert(recipe, ingredients)
+        if not args.no_exports:
+            write_exports(builder, args.csv)
+
+    n_recipes, n_terms = builder.save(args.index)
+    print(f"Saved {args.index}: {n_recipes} recipes, {n_terms} ingredients, "
+          f"generation {builder.generation} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()